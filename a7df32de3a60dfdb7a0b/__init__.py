@@ -1,117 +1,715 @@
 import asyncio
 import logging
-import hashlib
-from typing import List, AsyncGenerator, Dict
+import time
+from typing import List, AsyncGenerator, AsyncIterator, Dict, Optional, Union
 import httpx
-from datetime import datetime
-from exorde_data import Item, Content, Author, CreatedAt, Url, Domain, ExternalId
+from exorde_data import Item
+from .client import acquire_client, release_client, client_options, close_client, request_timeout
+from .prefetch import Prefetcher, DEFAULT_LOW_WATERMARK, DEFAULT_MAX_OUTSTANDING_FETCHES
+from .buffer import ItemBuffer, DEFAULT_BUFFER_CAPACITY, DEFAULT_BUFFER_MAX_BYTES
+from .endpoints import Endpoint, EndpointPool, get_endpoint_pool
+from .batching import BatchSizer, DEFAULT_MIN_BATCH_SIZE, DEFAULT_MAX_BATCH_SIZE, DEFAULT_TARGET_LATENCY_SECONDS
+from .retry import (
+    RetryPolicy,
+    RetryError,
+    RetryBudgetExhausted,
+    CircuitOpenError,
+    is_retryable,
+    DEFAULT_BASE_DELAY_SECONDS,
+    DEFAULT_MAX_DELAY_SECONDS,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_RETRY_DEADLINE_SECONDS,
+)
+from .authors import AuthorHasher, get_author_hasher, DEFAULT_AUTHOR_HASH, DEFAULT_AUTHOR_CACHE_SIZE, DEFAULT_BLAKE2B_DIGEST_SIZE
+from .ratelimit import TokenBucket, parse_retry_after, DEFAULT_RATE_LIMIT, DEFAULT_RATE_BURST
+from .stream import iter_stream, decode_tweets
+from .wire import request_headers, DEFAULT_WIRE_FORMAT, DEFAULT_COMPRESSION
+from .subscribe import Subscription, Subscriber, get_subscription, subscribe_timeout, DEFAULT_SUBSCRIBE_READ_TIMEOUT_SECONDS
+from .dates import format_created_at, format_created_at_batch
+from . import metrics
+from .spool import Spool, get_spool, DEFAULT_SPOOL_MAX_ITEMS
+from .coordinator import FetchCoordinator, get_coordinator, DEFAULT_MAX_FLIGHT_SIZE
+from .records import TweetRecord
+from .transform import (
+    TweetTransformer,
+    build_item,
+    build_record,
+    accept_tweet,
+    transform_tweets,
+    shutdown_executors,
+    DEFAULT_TRANSFORM_EXECUTOR,
+    DEFAULT_TRANSFORM_WORKERS,
+    DEFAULT_TRANSFORM_CHUNK_SIZE,
+    DEFAULT_NEAR_DUP_ACTION,
+)
+from .dedup import SeenIds, BloomFilter, get_deduplicator, DEFAULT_DEDUP_CAPACITY, DEFAULT_DEDUP_TTL_SECONDS, DEFAULT_DEDUP_ERROR_RATE
+from .filters import KeywordMatcher, TweetFilter, filter_options
+from .cursor import Cursor, get_cursor
+from .neardup import (
+    NearDuplicateIndex,
+    get_near_duplicate_index,
+    DEFAULT_NEAR_DUP_THRESHOLD,
+    DEFAULT_NEAR_DUP_CAPACITY,
+    DEFAULT_NEAR_DUP_TTL_SECONDS,
+)
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logging.getLogger('httpx').setLevel(logging.WARNING)  # Suppress info logs for httpx
+# Logging is configured by the application, the package only emits records
+logger = logging.getLogger(__name__)
 
 # Global configuration
 DEFAULT_SIZE = 100
 DEFAULT_MAXIMUM_ITEMS = 25  # Default maximum items to collect
-RETRY_DELAY_SECONDS = 5  # Delay before retrying after a 500 or 404 error
+DEFAULT_CHUNK_SIZE = None  # Items per list yielded by query_batches, None for all buffered ones
 
-# Global cache for items
-cached_items = []
+# Shared item buffer, used by queries that opt into sharing with `shared_buffer`
+cached_items = ItemBuffer()
 
-# Function to format created_at datetime
-def format_created_at(dt_str: str) -> str:
-    """Format the created_at string into the desired format."""
-    dt = datetime.strptime(dt_str, "%a %b %d %H:%M:%S %z %Y")
-    return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+# Function to request one batch of tweets from the API
+async def iter_tweets(
+    client: httpx.AsyncClient,
+    endpoints: EndpointPool,
+    size: int,
+    endpoint: Optional[Endpoint] = None,
+    retry: Optional[RetryPolicy] = None,
+    stream: bool = False,
+    timeout: Optional[httpx.Timeout] = None,
+    accept_headers: Optional[Dict[str, str]] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncGenerator[Dict, None]:
+    """Request `size` tweets and yield them, failing over to the next best endpoint on errors.
 
-# Function to fetch data from the API
-async def fetch_data(size: int):
-    """Fetch data from the API and populate the global cache."""
-    url = "http://169.254.100.180:8080/get_tweets"
+    Failed requests are retried with exponential backoff until the retry
+    policy gives up; while the endpoints keep failing, their circuit breaker
+    opens and requests fail fast with CircuitOpenError. Requests are paced by
+    the pool's rate limiter, which a 429 response slows down and pauses for
+    its Retry-After delay instead of counting it as a failure. With `stream`, the
+    response is decoded incrementally (JSON array or NDJSON) and each tweet is
+    yielded as soon as it has been received. A streamed batch that fails after
+    delivering tweets ends early instead of being fetched again. `timeout`
+    overrides the client's connect/read/write/pool timeouts for each request.
+    `accept_headers` negotiate the response format and compression, plain
+    JSON by default; responses are decoded according to their content type.
+    `filters` are added to the request body for upstreams that filter tweets
+    themselves.
+    """
     headers = {
         "Content-Type": "application/json"
     }
+    headers.update(accept_headers if accept_headers is not None else request_headers(stream))
     data = {
         "size": size
     }
+    if filters:
+        data.update(filters)
+    request_options = {} if timeout is None else {"timeout": timeout}
+    if endpoint is None:
+        endpoint = endpoints.choose()
+    if retry is None:
+        retry = RetryPolicy()
 
-    async with httpx.AsyncClient() as client:
-        while True:
-            try:
-                response = await client.post(url, headers=headers, json=data)
+    attempt = 0
+    while True:
+        await endpoints.limiter.acquire()
+        trial = endpoints.breaker.check()
+        url = endpoint.url
+        endpoint.in_flight += 1
+        started = time.monotonic()
+        streamed = 0
+        tweets = None
+        throttled = False
+        try:
+            if stream:
+                async with client.stream("POST", url, headers=headers, json=data, **request_options) as response:
+                    response.raise_for_status()
+                    endpoints.limiter.record_success(response.headers)
+                    content_type = response.headers.get("content-type", "application/json")
+                    async for tweet in iter_stream(response.aiter_bytes(), content_type, response.encoding or "utf-8"):
+                        streamed += 1
+                        metrics.ITEMS_FETCHED.inc()
+                        yield tweet
+                tweets = []
+                metrics.FETCH_BATCH_SIZE.observe(streamed)
+            else:
+                response = await client.post(url, headers=headers, json=data, **request_options)
                 response.raise_for_status()
-                tweets = response.json().get("tweets", [])
-                break
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 500 or e.response.status_code == 404:
-                    logging.error(f"Server error '{e.response.status_code} {e.response.reason_phrase}' for url '{url}'. Retrying in {RETRY_DELAY_SECONDS} seconds.")
-                    await asyncio.sleep(RETRY_DELAY_SECONDS)
-                else:
-                    raise
-            except httpx.ReadTimeout:
-                logging.error(f"ReadTimeout error for url '{url}'. Retrying in {RETRY_DELAY_SECONDS} seconds.")
-                await asyncio.sleep(RETRY_DELAY_SECONDS)
-
-        for tweet in tweets:
-            content = tweet.get("content_", "").strip()
-            if not content:
-                continue
-
-            post_author = tweet.get("author_", "[deleted]")
-            created_at = tweet.get("created_at_", "")
-            domain = tweet.get("domain_", "x.com")
-            url = tweet.get("url_", "")
-            external_id = tweet.get("external_id_", "")
-
-            item = Item(
-                content=Content(content),
-                author=Author(hashlib.sha1(bytes(post_author, encoding="utf-8")).hexdigest()),
-                created_at=CreatedAt(format_created_at(created_at)),
-                domain=Domain(domain),
-                url=Url(url),
-                external_id=ExternalId(external_id)
-            )
-
-            cached_items.append(item)
+                endpoints.limiter.record_success(response.headers)
+                tweets = decode_tweets(response.content, response.headers.get("content-type", "application/json"), response.encoding or "utf-8")
+                metrics.ITEMS_FETCHED.inc(len(tweets))
+                metrics.FETCH_BATCH_SIZE.observe(len(tweets))
+            elapsed = time.monotonic() - started
+            metrics.FETCH_LATENCY.observe(elapsed)
+            endpoints.record_success(endpoint, elapsed)
+            endpoints.breaker.record_success()
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            if not is_retryable(e):
+                raise
+            last_error = e
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+                throttled = True
+                endpoints.limiter.record_throttled(parse_retry_after(e.response.headers.get("retry-after")))
+                endpoints.breaker.record_throttled()
+            if isinstance(e, httpx.HTTPStatusError):
+                error = f"Server error '{e.response.status_code} {e.response.reason_phrase}' for url '{url}'."
+            else:
+                error = f"{type(e).__name__} error for url '{url}'."
+        finally:
+            endpoint.in_flight -= 1
+            if trial and endpoints.breaker.trial_in_flight:
+                # Cancelled or failed without a verdict on the upstream, e.g. a 400 or an undecodable body
+                endpoints.breaker.release_trial()
+
+        if tweets is not None:
+            for tweet in tweets:
+                yield tweet
+            return
+
+        if throttled:
+            # The upstream is healthy but wants fewer requests, the limiter holds the next one back
+            retry.next_delay(attempt, last_error)
+            metrics.FETCH_RETRIES.inc()
+            metrics.FETCH_THROTTLED.inc()
+            pause = max(0.0, endpoints.limiter.blocked_until - time.monotonic())
+            logger.warning(f"{error} Rate limited, pausing requests for {pause:.2f} seconds.")
+            continue
+        endpoints.record_failure(endpoint)
+        endpoints.breaker.record_failure()
+        if streamed:
+            logger.error(f"{error} Ending the batch after {streamed} streamed tweets.")
+            return
+        delay = retry.next_delay(attempt, last_error)
+        metrics.FETCH_RETRIES.inc()
+        attempt += 1
+        endpoint = endpoints.choose(exclude=[endpoint])
+        if endpoint.available(time.monotonic()):
+            logger.error(f"{error} Retrying on '{endpoint.url}'.")
+        else:
+            logger.error(f"{error} Retrying in {delay:.2f} seconds.")
+            await asyncio.sleep(delay)
+
+# Function to request one whole batch of tweets from the API
+async def request_tweets(
+    client: httpx.AsyncClient,
+    endpoints: EndpointPool,
+    size: int,
+    endpoint: Optional[Endpoint] = None,
+    retry: Optional[RetryPolicy] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    accept_headers: Optional[Dict[str, str]] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
+    """Request `size` tweets and return them once the whole response has arrived."""
+    return [tweet async for tweet in iter_tweets(client, endpoints, size, endpoint, retry, timeout=timeout, accept_headers=accept_headers, filters=filters)]
+
+# Function to buffer the records of accepted tweets
+async def put_items(transformer: TweetTransformer, pairs: List, buffer: ItemBuffer) -> int:
+    """Build the records of accepted (tweet, content) pairs, add them to the buffer and return how many were added."""
+    count = 0
+    async for records in transformer.transform(pairs):
+        for record in records:
+            await buffer.put(record)
+        count += len(records)
+    return count
+
+# Function to buffer the items of tweets as they arrive
+async def buffer_tweets(tweets: AsyncIterator[Dict], buffer: ItemBuffer, transformer: TweetTransformer) -> int:
+    """Turn tweets into Items as they arrive, add them to the buffer and return how many were added.
+
+    Items are built one tweet at a time, or in chunks when the transformer
+    uses an executor.
+    """
+    chunk_size = transformer.chunk_size if transformer.executor is not None else 1
+    count = 0
+    pending = []
+    async for tweet in tweets:
+        content = transformer.accept(tweet)
+        if content is not None:
+            pending.append((tweet, content))
+            if len(pending) >= chunk_size:
+                batch, pending = pending, []
+                count += await put_items(transformer, batch, buffer)
+    return count + await put_items(transformer, pending, buffer)
+
+# Function to fetch one share of a batch and buffer its items
+async def fetch_batch(
+    client: httpx.AsyncClient,
+    endpoints: EndpointPool,
+    endpoint: Endpoint,
+    size: int,
+    buffer: ItemBuffer,
+    retry: Optional[RetryPolicy] = None,
+    transformer: Optional[TweetTransformer] = None,
+    stream: bool = False,
+    timeout: Optional[httpx.Timeout] = None,
+    accept_headers: Optional[Dict[str, str]] = None,
+) -> int:
+    """Fetch `size` tweets starting with `endpoint`, add them to the buffer and return how many were added.
+
+    `transformer` filters the raw tweets and builds their Items, by default
+    on the event loop with the shared author hasher and no deduplication;
+    its filters are also sent upstream when pushdown is enabled.
+    With `stream`, Items are buffered as soon as their tweets have been
+    received (in chunks when the transformer uses an executor) instead of
+    after the whole response.
+    """
+    if transformer is None:
+        transformer = TweetTransformer()
+    filters = transformer.upstream_fields()
+    if stream:
+        tweets = iter_tweets(client, endpoints, size, endpoint, retry, stream=True, timeout=timeout, accept_headers=accept_headers, filters=filters)
+        return await buffer_tweets(tweets, buffer, transformer)
+    pending = []
+    for tweet in await request_tweets(client, endpoints, size, endpoint, retry, timeout, accept_headers, filters):
+        content = transformer.accept(tweet)
+        if content is not None:
+            pending.append((tweet, content))
+    return await put_items(transformer, pending, buffer)
+
+# Function to fetch data from the API
+async def fetch_data(
+    size: int,
+    client: Optional[httpx.AsyncClient] = None,
+    buffer: Optional[ItemBuffer] = None,
+    endpoints: Optional[EndpointPool] = None,
+    fanout: Optional[int] = None,
+    retry: Optional[RetryPolicy] = None,
+    transformer: Optional[TweetTransformer] = None,
+    stream: bool = False,
+    timeout: Optional[httpx.Timeout] = None,
+    accept_headers: Optional[Dict[str, str]] = None,
+) -> int:
+    """Fetch data from the API, populate the buffer (the shared cache by default) and return the number of items added.
+
+    The batch is split across up to `fanout` of the best available endpoints
+    (all of them by default) and requested concurrently; items from each host
+    are buffered as soon as its response arrives. Uses the given client, or
+    the shared pooled client when none is provided, and waits for room while
+    the buffer is full.
+    """
+    if buffer is None:
+        buffer = cached_items
+    if endpoints is None:
+        endpoints = get_endpoint_pool()
+    if retry is None:
+        retry = RetryPolicy()
+
+    owns_client = client is None
+    if owns_client:
+        client = acquire_client()
+    tasks = [
+        asyncio.create_task(fetch_batch(client, endpoints, endpoint, share, buffer, retry, transformer, stream, timeout, accept_headers))
+        for endpoint, share in endpoints.split(size, fanout)
+    ]
+    try:
+        return sum(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+        if owns_client:
+            await release_client(client)
+
+# Function to build the prefetcher that keeps a scrape's buffer filled
+def create_prefetcher(
+    size: int,
+    buffer: ItemBuffer,
+    client: Optional[httpx.AsyncClient] = None,
+    prefetch: bool = False,
+    low_watermark: int = DEFAULT_LOW_WATERMARK,
+    max_outstanding_fetches: int = DEFAULT_MAX_OUTSTANDING_FETCHES,
+    endpoints: Optional[EndpointPool] = None,
+    fanout: Optional[int] = None,
+    batch_sizer: Optional[BatchSizer] = None,
+    retry: Optional[RetryPolicy] = None,
+    transformer: Optional[TweetTransformer] = None,
+    stream: bool = False,
+    coordinator: Optional[FetchCoordinator] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    accept_headers: Optional[Dict[str, str]] = None,
+    subscription: Optional[Subscription] = None,
+) -> Union[Prefetcher, Subscriber]:
+    """Return a Prefetcher whose fetches fill `buffer`, early with `prefetch` or only once it is empty.
+
+    Requests for a private buffer of an unfiltered query ask for at most the
+    items still needed, other requests for whole batches. A batch that adds
+    no items is followed by a backoff delay before the next one.
+    With a `coordinator`, fetches join the request it has in flight for
+    other consumers instead of each making their own. With a `subscription`,
+    the buffer is fed by the pushed tweets instead and a Subscriber is
+    returned.
+    """
+    if subscription is not None:
+        if transformer is None:
+            transformer = TweetTransformer()
+
+        async def pump(needed: int):
+            return await buffer_tweets(subscription.tweets(client, retry, timeout, needed), buffer, transformer)
+
+        return Subscriber(pump, lambda: len(buffer))
+    if not prefetch:
+        low_watermark = 0
+        max_outstanding_fetches = 1
+
+    async def fetch_into(batch_size: int, target: ItemBuffer) -> int:
+        return await fetch_data(batch_size, client, target, endpoints, fanout, retry, transformer, stream, timeout, accept_headers)
+
+    backoff = retry if retry is not None else RetryPolicy()
+    empty_batches = 0
+
+    async def fetch(batch_size: int):
+        nonlocal empty_batches
+        started = time.monotonic()
+        if coordinator is not None:
+            count = await coordinator.fetch(buffer, batch_size, fetch_into)
+        else:
+            count = await fetch_into(batch_size, buffer)
+        if batch_sizer is not None:
+            batch_sizer.observe(batch_size, count, time.monotonic() - started)
+        if count:
+            empty_batches = 0
+            return
+        # Nothing new upstream, or everything was rejected: asking again right away would get the same
+        delay = backoff.backoff(empty_batches)
+        empty_batches += 1
+        logger.info(f"No items added by the last batch, waiting {delay:.2f} seconds before the next one.")
+        await asyncio.sleep(delay)
+
+    # Part of a filtered batch is rejected, so its requests are not capped to the items still needed
+    filtering = transformer is not None and transformer.filtering
+    if batch_sizer is not None:
+        def next_size(needed: int) -> int:
+            return batch_sizer.next_size(batch_sizer.max_size if filtering else needed)
+    elif buffer is cached_items or filtering:
+        next_size = size  # Leftovers stay in the shared cache for the next query
+    else:
+        # What a private buffer does not hand out is dropped (or spooled) when the query ends
+        def next_size(needed: int) -> int:
+            return max(1, min(size, needed))
+    return Prefetcher(fetch, lambda: len(buffer), next_size, low_watermark, max_outstanding_fetches)
+
+# Function to turn the log_items option into a sampling interval
+def log_interval(log_items: Union[bool, float]) -> int:
+    """Log every n-th item, 0 to log none."""
+    if log_items is True:
+        return 1
+    if log_items:
+        return max(1, round(1 / log_items))
+    return 0
+
+# Function to wait until a scrape has items to hand out
+async def wait_for_items(prefetcher: Union[Prefetcher, Subscriber], buffer: ItemBuffer, remaining: int, expires: Optional[float] = None) -> bool:
+    """Keep fetches running until `buffer` has items; False once the `expires` time (monotonic) has passed."""
+    while True:
+        if expires is not None and time.monotonic() >= expires:
+            return False
+        if buffer:
+            return True
+        prefetcher.refill(remaining)
+        await prefetcher.wait(buffer.wait_not_empty(), timeout=None if expires is None else expires - time.monotonic())
 
 # Main scraping function
-async def scrape(size: int, maximum_items_to_collect: int) -> AsyncGenerator[Item, None]:
+async def scrape(
+    size: int,
+    maximum_items_to_collect: int,
+    client: Optional[httpx.AsyncClient] = None,
+    prefetch: bool = False,
+    low_watermark: int = DEFAULT_LOW_WATERMARK,
+    max_outstanding_fetches: int = DEFAULT_MAX_OUTSTANDING_FETCHES,
+    buffer: Optional[ItemBuffer] = None,
+    endpoints: Optional[EndpointPool] = None,
+    fanout: Optional[int] = None,
+    batch_sizer: Optional[BatchSizer] = None,
+    retry: Optional[RetryPolicy] = None,
+    transformer: Optional[TweetTransformer] = None,
+    stream: bool = False,
+    log_items: Union[bool, float] = False,
+    coordinator: Optional[FetchCoordinator] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    deadline: Optional[float] = None,
+    accept_headers: Optional[Dict[str, str]] = None,
+    subscription: Optional[Subscription] = None,
+) -> AsyncGenerator[Item, None]:
     """Scrape data and yield items up to the maximum specified."""
+    if buffer is None:
+        buffer = ItemBuffer()
+    if retry is None:
+        retry = RetryPolicy()
+    if transformer is None:
+        transformer = TweetTransformer()
+    log_every = log_interval(log_items)  # True logs every item, a float that share of them
+    # Batches are fetched in the background while the buffer is consumed
+    prefetcher = create_prefetcher(
+        size, buffer, client, prefetch, low_watermark, max_outstanding_fetches,
+        endpoints, fanout, batch_sizer, retry, transformer, stream, coordinator, timeout, accept_headers, subscription,
+    )
+    # Past the deadline the scrape ends with the items collected so far
+    expires = None if deadline is None else time.monotonic() + deadline
     collected_items = 0
     try:
         while collected_items < maximum_items_to_collect:
-            if not cached_items:
-                await fetch_data(size)
+            prefetcher.refill(maximum_items_to_collect - collected_items)
+            if not await wait_for_items(prefetcher, buffer, maximum_items_to_collect - collected_items, expires):
+                logger.info(f"Deadline reached, ending the scrape after {collected_items} items.")
+                break
 
             try:
-                item = cached_items.pop(0)
-                logging.info(f"Yielding item: {item}")
+                # Only items that are handed out are built, leftovers stay compact records
+                record = buffer.popleft()
+                item = record.to_item()
+                if log_every and collected_items % log_every == 0:
+                    logger.info(f"Yielding item: {item}")
+                metrics.ITEMS_YIELDED.inc()
+                transformer.yielded(record)
                 yield item
                 collected_items += 1
             except GeneratorExit:
-                logging.info("GeneratorExit encountered within loop. Continuing processing.")
+                logger.info("GeneratorExit encountered within loop. Continuing processing.")
                 # Re-raise the GeneratorExit after processing the current item
                 raise
     except GeneratorExit:
-        logging.info("GeneratorExit encountered in scrape. Closing the generator.")
+        logger.info("GeneratorExit encountered in scrape. Closing the generator.")
     finally:
-        # Add any necessary cleanup code here (e.g., closing connections)
-        pass
+        await prefetcher.close()
+        await transformer.save()
+
+# Batch scraping function
+async def scrape_batches(
+    size: int,
+    maximum_items_to_collect: int,
+    client: Optional[httpx.AsyncClient] = None,
+    prefetch: bool = False,
+    low_watermark: int = DEFAULT_LOW_WATERMARK,
+    max_outstanding_fetches: int = DEFAULT_MAX_OUTSTANDING_FETCHES,
+    buffer: Optional[ItemBuffer] = None,
+    endpoints: Optional[EndpointPool] = None,
+    fanout: Optional[int] = None,
+    batch_sizer: Optional[BatchSizer] = None,
+    retry: Optional[RetryPolicy] = None,
+    transformer: Optional[TweetTransformer] = None,
+    stream: bool = False,
+    log_items: Union[bool, float] = False,
+    coordinator: Optional[FetchCoordinator] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    deadline: Optional[float] = None,
+    accept_headers: Optional[Dict[str, str]] = None,
+    subscription: Optional[Subscription] = None,
+    chunk_size: Optional[int] = DEFAULT_CHUNK_SIZE,
+) -> AsyncGenerator[List[Item], None]:
+    """Like `scrape`, but yield lists of at most `chunk_size` items instead of one item at a time."""
+    if buffer is None:
+        buffer = ItemBuffer()
+    if retry is None:
+        retry = RetryPolicy()
+    if transformer is None:
+        transformer = TweetTransformer()
+    log_every = log_interval(log_items)
+    prefetcher = create_prefetcher(
+        size, buffer, client, prefetch, low_watermark, max_outstanding_fetches,
+        endpoints, fanout, batch_sizer, retry, transformer, stream, coordinator, timeout, accept_headers, subscription,
+    )
+    expires = None if deadline is None else time.monotonic() + deadline
+    collected_items = 0
+    try:
+        while collected_items < maximum_items_to_collect:
+            remaining = maximum_items_to_collect - collected_items
+            if not await wait_for_items(prefetcher, buffer, remaining, expires):
+                logger.info(f"Deadline reached, ending the scrape after {collected_items} items.")
+                break
+
+            records = buffer.pop_many(min(remaining, chunk_size or remaining))
+            batch = [record.to_item() for record in records]
+            if log_every:
+                for index, item in enumerate(batch, collected_items):
+                    if index % log_every == 0:
+                        logger.info(f"Yielding item: {item}")
+            collected_items += len(batch)
+            # The next fetch runs while the caller processes the list
+            prefetcher.refill(maximum_items_to_collect - collected_items)
+            metrics.ITEMS_YIELDED.inc(len(batch))
+            for record in records:
+                transformer.yielded(record)
+            yield batch
+    except GeneratorExit:
+        logger.info("GeneratorExit encountered in scrape_batches. Closing the generator.")
+    finally:
+        await prefetcher.close()
+        await transformer.save()
+
+# Function to map query parameters onto scrape options
+def scrape_options(parameters: Dict) -> Dict:
+    """Build the keyword arguments of `scrape` and `scrape_batches` other than the client and buffer."""
+    size = parameters.get("size", DEFAULT_SIZE)  # Use the global default size
+    endpoints = get_endpoint_pool(
+        parameters.get("endpoints", parameters.get("url")),
+        parameters.get("rate_limit", DEFAULT_RATE_LIMIT),
+        parameters.get("rate_burst", DEFAULT_RATE_BURST),
+    )
+    # Batch sizes are learned per endpoint pool across queries, a single query rarely makes enough requests
+    batch_sizer = None
+    if parameters.get("adaptive_size", False):
+        batch_sizer = endpoints.batch_sizer(
+            size,
+            parameters.get("min_size", DEFAULT_MIN_BATCH_SIZE),
+            parameters.get("max_size", DEFAULT_MAX_BATCH_SIZE),
+            parameters.get("target_latency", DEFAULT_TARGET_LATENCY_SECONDS),
+        )
+    dedup = parameters.get("dedup", False)
+    if dedup:
+        dedup = get_deduplicator(
+            "lru" if dedup is True else dedup,
+            parameters.get("dedup_capacity", DEFAULT_DEDUP_CAPACITY),
+            parameters.get("dedup_ttl", DEFAULT_DEDUP_TTL_SECONDS),
+            parameters.get("dedup_error_rate", DEFAULT_DEDUP_ERROR_RATE),
+            parameters.get("dedup_path"),
+        )
+    else:
+        dedup = None
+    # Retweets, copy-paste spam and lightly edited copies of recent content
+    near_dup = parameters.get("near_dup", False)
+    near_duplicates = None
+    near_duplicate_action = DEFAULT_NEAR_DUP_ACTION
+    if near_dup:
+        if near_dup is not True:
+            near_duplicate_action = near_dup
+        near_duplicates = get_near_duplicate_index(
+            parameters.get("near_dup_threshold", DEFAULT_NEAR_DUP_THRESHOLD),
+            parameters.get("near_dup_capacity", DEFAULT_NEAR_DUP_CAPACITY),
+            parameters.get("near_dup_ttl", DEFAULT_NEAR_DUP_TTL_SECONDS),
+        )
+    # Queries of a profile resume after the last tweet it yielded, across restarts with a `cursor_path`
+    cursor = parameters.get("cursor", False)
+    if cursor:
+        cursor = get_cursor("default" if cursor is True else cursor, parameters.get("cursor_path"))
+    else:
+        cursor = None
+    # A push subscription replaces polling when the upstream offers one
+    subscription = None
+    timeout = request_timeout(parameters)
+    if parameters.get("subscribe_url"):
+        subscription = get_subscription(parameters["subscribe_url"])
+        timeout = subscribe_timeout(timeout, parameters.get("subscribe_read_timeout", DEFAULT_SUBSCRIBE_READ_TIMEOUT_SECONDS))
+    # Queries in one process can coalesce their upstream requests
+    coordinator = parameters.get("coalesce", False)
+    if coordinator:
+        coordinator = get_coordinator(
+            "default" if coordinator is True else coordinator,
+            parameters.get("max_flight_size", DEFAULT_MAX_FLIGHT_SIZE),
+        )
+    else:
+        coordinator = None
+    return dict(
+        size=size,
+        maximum_items_to_collect=parameters.get("maximum_items_to_collect", DEFAULT_MAXIMUM_ITEMS),  # Use the global default max items
+        prefetch=parameters.get("prefetch", False),
+        low_watermark=parameters.get("low_watermark", DEFAULT_LOW_WATERMARK),
+        max_outstanding_fetches=parameters.get("max_outstanding_fetches", DEFAULT_MAX_OUTSTANDING_FETCHES),
+        endpoints=endpoints,
+        fanout=parameters.get("fanout"),
+        batch_sizer=batch_sizer,
+        retry=RetryPolicy(
+            base_delay=parameters.get("retry_base_delay", DEFAULT_BASE_DELAY_SECONDS),
+            max_delay=parameters.get("retry_max_delay", DEFAULT_MAX_DELAY_SECONDS),
+            max_retries=parameters.get("max_retries", DEFAULT_MAX_RETRIES),
+            deadline=parameters.get("retry_deadline", DEFAULT_RETRY_DEADLINE_SECONDS),
+        ),
+        transformer=TweetTransformer(
+            author_hasher=get_author_hasher(
+                parameters.get("author_hash", DEFAULT_AUTHOR_HASH),
+                parameters.get("author_hash_cache_size", DEFAULT_AUTHOR_CACHE_SIZE),
+                parameters.get("author_digest_size", DEFAULT_BLAKE2B_DIGEST_SIZE),
+            ),
+            dedup=dedup,
+            executor=parameters.get("transform_executor", DEFAULT_TRANSFORM_EXECUTOR),
+            workers=parameters.get("transform_workers", DEFAULT_TRANSFORM_WORKERS),
+            chunk_size=parameters.get("transform_chunk_size", DEFAULT_TRANSFORM_CHUNK_SIZE),
+            tweet_filter=filter_options(parameters),
+            near_duplicates=near_duplicates,
+            near_duplicate_action=near_duplicate_action,
+            cursor=cursor,
+        ),
+        stream=parameters.get("stream", False),
+        log_items=parameters.get("log_items", False),
+        coordinator=coordinator,
+        timeout=timeout,
+        deadline=parameters.get("deadline"),
+        accept_headers=request_headers(
+            parameters.get("stream", False),
+            parameters.get("wire_format", DEFAULT_WIRE_FORMAT),
+            parameters.get("compression", DEFAULT_COMPRESSION),
+        ),
+        subscription=subscription,
+    )
+
+# Function to set up the buffer a query drains
+def open_query_buffer(parameters: Dict, maximum_items_to_collect: int, transformer: TweetTransformer):
+    """Return the query's buffer and spool, with items left over by earlier queries already buffered."""
+    # Each query drains its own bounded buffer unless sharing is requested
+    if parameters.get("shared_buffer", False):
+        buffer = cached_items
+    else:
+        buffer = ItemBuffer(
+            parameters.get("buffer_capacity", DEFAULT_BUFFER_CAPACITY),
+            parameters.get("buffer_max_bytes", DEFAULT_BUFFER_MAX_BYTES),
+        )
+    # Serve items left over by earlier queries before hitting the network
+    spool = None
+    if parameters.get("spool_path"):
+        spool = get_spool(parameters["spool_path"], parameters.get("spool_max_items", DEFAULT_SPOOL_MAX_ITEMS))
+        # Their ids are held like those of fetched tweets, so a refetch of their page is deduplicated
+        for record in transformer.restore(spool.pop(min(maximum_items_to_collect, buffer.capacity) - len(buffer))):
+            buffer.put_nowait(record)
+    return buffer, spool
+
+# Function to release the buffer of a finished query
+def close_query_buffer(buffer: ItemBuffer, spool: Optional[Spool]):
+    """Spool or drop the items a query fetched but did not yield."""
+    if buffer is not cached_items:
+        if spool is not None:
+            spool.push(buffer.pop_many(len(buffer)))
+        buffer.clear()
 
 # Main interface function
 async def query(parameters: Dict) -> AsyncGenerator[Item, None]:
     """Query interface for collecting items."""
-    size = parameters.get("size", DEFAULT_SIZE)  # Use the global default size
-    maximum_items_to_collect = parameters.get("maximum_items_to_collect", DEFAULT_MAXIMUM_ITEMS)  # Use the global default max items
-    logging.info(f"Querying {size} items per request.")
+    options = scrape_options(parameters)
+    # An injected client is owned by the caller, otherwise share the pooled client
+    client = parameters.get("client")
+    owns_client = client is None
+    if owns_client:
+        client = acquire_client(**client_options(parameters))
+    buffer, spool = open_query_buffer(parameters, options["maximum_items_to_collect"], options["transformer"])
+    logger.info(f"Querying {options['size']} items per request.")
+    items = scrape(client=client, buffer=buffer, **options)
     try:
-        async for item in scrape(size, maximum_items_to_collect):
+        async for item in items:
             yield item
     except GeneratorExit:
-        logging.info("GeneratorExit encountered in query. Closing the generator.")
+        logger.info("GeneratorExit encountered in query. Closing the generator.")
+    finally:
+        await items.aclose()
+        close_query_buffer(buffer, spool)
+        if owns_client:
+            await release_client(client)
+
+# Batch interface function
+async def query_batches(parameters: Dict) -> AsyncGenerator[List[Item], None]:
+    """Query interface yielding lists of items, at most `chunk_size` each, for bulk consumers."""
+    options = scrape_options(parameters)
+    client = parameters.get("client")
+    owns_client = client is None
+    if owns_client:
+        client = acquire_client(**client_options(parameters))
+    buffer, spool = open_query_buffer(parameters, options["maximum_items_to_collect"], options["transformer"])
+    logger.info(f"Querying {options['size']} items per request in batches.")
+    batches = scrape_batches(client=client, buffer=buffer, chunk_size=parameters.get("chunk_size", DEFAULT_CHUNK_SIZE), **options)
+    try:
+        async for batch in batches:
+            yield batch
+    except GeneratorExit:
+        logger.info("GeneratorExit encountered in query_batches. Closing the generator.")
     finally:
-        # Add any necessary cleanup code here (e.g., closing connections)
-        pass
+        await batches.aclose()
+        close_query_buffer(buffer, spool)
+        if owns_client:
+            await release_client(client)
 
 # Function to gather results for testing
 async def gather_results(parameters: Dict) -> List[Item]:
@@ -0,0 +1,74 @@
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict
+from .registry import Registry
+
+# Author pseudonymization configuration
+DEFAULT_AUTHOR_HASH = "sha1"
+DEFAULT_AUTHOR_CACHE_SIZE = 50_000  # Distinct authors kept in the cache
+DEFAULT_BLAKE2B_DIGEST_SIZE = 20  # Bytes, same hex length as sha1
+
+
+def _digest_function(algorithm: str, digest_size: int) -> Callable[[bytes], str]:
+    if algorithm == "sha1":
+        return lambda data: hashlib.sha1(data).hexdigest()
+    if algorithm == "blake2b":
+        return lambda data: hashlib.blake2b(data, digest_size=digest_size).hexdigest()
+    raise ValueError(f"Unknown author hash '{algorithm}', expected 'sha1' or 'blake2b'.")
+
+
+class AuthorHasher:
+    """Pseudonymize author names, memoizing the digests of recent authors.
+
+    Busy streams repeat the same accounts constantly, so digests are kept in a
+    bounded LRU cache. `hits` and `misses` count cache lookups.
+    """
+
+    def __init__(
+        self,
+        algorithm: str = DEFAULT_AUTHOR_HASH,
+        cache_size: int = DEFAULT_AUTHOR_CACHE_SIZE,
+        digest_size: int = DEFAULT_BLAKE2B_DIGEST_SIZE,
+    ):
+        self.algorithm = algorithm
+        self.cache_size = cache_size
+        self.digest_size = digest_size
+        self._digest = _digest_function(algorithm, digest_size)
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, author: str) -> str:
+        digest = self._cache.get(author)
+        if digest is not None:
+            self.hits += 1
+            try:
+                self._cache.move_to_end(author)
+            except KeyError:
+                pass  # Evicted meanwhile by another transform thread
+            return digest
+        self.misses += 1
+        digest = self._digest(bytes(author, encoding="utf-8"))
+        if self.cache_size > 0:
+            self._cache[author] = digest
+            if len(self._cache) > self.cache_size:
+                try:
+                    self._cache.popitem(last=False)
+                except KeyError:
+                    pass
+        return digest
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+
+_hashers: "Registry[AuthorHasher]" = Registry()
+
+
+def get_author_hasher(
+    algorithm: str = DEFAULT_AUTHOR_HASH,
+    cache_size: int = DEFAULT_AUTHOR_CACHE_SIZE,
+    digest_size: int = DEFAULT_BLAKE2B_DIGEST_SIZE,
+) -> AuthorHasher:
+    """Return the process-wide author hasher for the given configuration."""
+    return _hashers.get((algorithm, cache_size, digest_size), lambda: AuthorHasher(algorithm, cache_size, digest_size))
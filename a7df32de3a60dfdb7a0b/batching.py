@@ -0,0 +1,59 @@
+from typing import Optional
+
+# Adaptive batch size configuration
+DEFAULT_MIN_BATCH_SIZE = 10
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_TARGET_LATENCY_SECONDS = 2.0  # Responses slower than this shrink the batch
+GROWTH_FACTOR = 1.5
+SHRINK_FACTOR = 0.5
+THROUGHPUT_TOLERANCE = 0.9  # Reverse direction when throughput falls below this share of the previous rate
+
+
+class BatchSizer:
+    """Tune the requested batch size from observed response times.
+
+    Hill climbing on items per second: the size keeps moving in the same
+    direction while throughput holds up and turns around when it drops, and
+    shrinks sharply whenever a response exceeds `target_latency`. Requests are
+    also capped to the number of items still needed, so small runs never
+    over-fetch. Sizers are kept by the endpoint pool, so what one query
+    learned carries over to the next.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_size: int = DEFAULT_MIN_BATCH_SIZE,
+        max_size: int = DEFAULT_MAX_BATCH_SIZE,
+        target_latency: float = DEFAULT_TARGET_LATENCY_SECONDS,
+    ):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.target_latency = target_latency
+        self.size = self._clamp(initial)
+        self.last_rate: Optional[float] = None
+        self.growing = True
+
+    def _clamp(self, size: float) -> int:
+        return int(min(self.max_size, max(self.min_size, size)))
+
+    def next_size(self, needed: int) -> int:
+        """Size of the next request when `needed` more items are wanted."""
+        return max(1, min(self.size, needed))
+
+    def observe(self, requested: int, received: int, elapsed: float):
+        """Update the batch size after a request of `requested` items completed."""
+        if elapsed > self.target_latency:
+            # Even a capped request was too slow for the current size
+            self.size = self._clamp(min(self.size, requested) * SHRINK_FACTOR)
+            self.growing = False
+            self.last_rate = None
+            return
+        if requested < self.size:
+            return  # Capped requests say little about the throughput of the current size
+        rate = received / elapsed if elapsed > 0 else float(received)
+        if self.last_rate is not None and rate < self.last_rate * THROUGHPUT_TOLERANCE:
+            self.growing = not self.growing
+        self.last_rate = rate
+        factor = GROWTH_FACTOR if self.growing else 1 / GROWTH_FACTOR
+        self.size = self._clamp(self.size * factor)
@@ -0,0 +1,135 @@
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Iterable, List, Optional
+from .metrics import BUFFER_DEPTH
+
+# Buffer configuration
+DEFAULT_BUFFER_CAPACITY = 1000  # Maximum number of buffered items
+DEFAULT_BUFFER_MAX_BYTES = None  # Optional cap on the estimated size of buffered items
+
+
+def estimate_item_size(item: Any) -> int:
+    """Estimate the size of an item in bytes from its text fields."""
+    size = 0
+    for field in ("content", "author", "created_at", "domain", "url", "external_id"):
+        value = getattr(item, field, None)
+        if value:
+            size += len(value)
+    return size
+
+
+class ItemBuffer:
+    """Bounded FIFO buffer of items with backpressure.
+
+    Items are popped from the left in O(1). Producers calling `put` wait while
+    the buffer holds `capacity` items or `max_bytes` estimated bytes; an item
+    is always accepted into an empty buffer so oversized items cannot stall
+    the stream.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_BUFFER_CAPACITY,
+        max_bytes: Optional[int] = DEFAULT_BUFFER_MAX_BYTES,
+        sizeof: Callable[[Any], int] = estimate_item_size,
+    ):
+        self.capacity = max(1, capacity)
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._items: Deque = deque()
+        self._sizes: Deque[int] = deque()
+        self._putters: Deque[asyncio.Future] = deque()
+        self._getters: Deque[asyncio.Future] = deque()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def _has_room(self, size: int) -> bool:
+        if not self._items:
+            return True
+        if len(self._items) >= self.capacity:
+            return False
+        return self.max_bytes is None or self.bytes + size <= self.max_bytes
+
+    @staticmethod
+    def _wake(waiters: Deque[asyncio.Future]):
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def put_nowait(self, item: Any):
+        """Append an item without waiting for room."""
+        size = self.sizeof(item) if self.max_bytes is not None else 0
+        self._items.append(item)
+        self._sizes.append(size)
+        self.bytes += size
+        BUFFER_DEPTH.inc()
+        self._wake(self._getters)
+
+    async def put(self, item: Any):
+        """Append an item, waiting while the buffer is full."""
+        size = self.sizeof(item) if self.max_bytes is not None else 0
+        while not self._has_room(size):
+            waiter = asyncio.get_running_loop().create_future()
+            self._putters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                waiter.cancel()
+                # Pass the wake-up on so another producer is not left waiting
+                if self._has_room(0):
+                    self._wake(self._putters)
+                raise
+        self._items.append(item)
+        self._sizes.append(size)
+        self.bytes += size
+        BUFFER_DEPTH.inc()
+        self._wake(self._getters)
+        if self._putters and self._has_room(0):
+            self._wake(self._putters)
+
+    async def put_many(self, items: Iterable[Any]):
+        """Append several items in order, waiting for room as needed."""
+        for item in items:
+            await self.put(item)
+
+    def popleft(self) -> Any:
+        """Remove and return the oldest item. Raises IndexError when empty."""
+        item = self._items.popleft()
+        self.bytes -= self._sizes.popleft()
+        BUFFER_DEPTH.dec()
+        self._wake(self._putters)
+        return item
+
+    def pop_many(self, count: int) -> List[Any]:
+        """Remove and return up to `count` of the oldest items."""
+        items = []
+        while self._items and len(items) < count:
+            items.append(self.popleft())
+        return items
+
+    async def wait_not_empty(self):
+        """Wait until at least one item is buffered."""
+        while not self._items:
+            waiter = asyncio.get_running_loop().create_future()
+            self._getters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                waiter.cancel()
+                raise
+
+    def clear(self):
+        """Drop all buffered items and wake any waiting producers."""
+        BUFFER_DEPTH.dec(len(self._items))
+        self._items.clear()
+        self._sizes.clear()
+        self.bytes = 0
+        while self._putters:
+            self._wake(self._putters)
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0  # Seconds an idle connection is kept alive
+DEFAULT_HTTP2 = False
+
+# Request timeout configuration, in seconds
+DEFAULT_TIMEOUT_SECONDS = 5.0  # Applies to every phase without its own timeout
+DEFAULT_CONNECT_TIMEOUT_SECONDS = None  # Establishing a connection
+DEFAULT_READ_TIMEOUT_SECONDS = None  # Waiting for each chunk of the response
+DEFAULT_WRITE_TIMEOUT_SECONDS = None  # Sending each chunk of the request
+DEFAULT_POOL_TIMEOUT_SECONDS = None  # Waiting for a free connection from the pool
+
+# Process-wide shared client, the event loop it is bound to and the close tasks of replaced clients
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_closing: Set[asyncio.Future] = set()
+
+
+def client_options(parameters: Dict) -> Dict:
+    """Extract the connection pool options from the query parameters."""
+    return {
+        "max_connections": parameters.get("max_connections", DEFAULT_MAX_CONNECTIONS),
+        "max_keepalive_connections": parameters.get("max_keepalive_connections", DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+        "keepalive_expiry": parameters.get("keepalive_expiry", DEFAULT_KEEPALIVE_EXPIRY),
+        "http2": parameters.get("http2", DEFAULT_HTTP2),
+    }
+
+
+def request_timeout(parameters: Dict) -> httpx.Timeout:
+    """Build the per-request timeouts from the query parameters.
+
+    `timeout` applies to every phase; `connect_timeout`, `read_timeout`,
+    `write_timeout` and `pool_timeout` override single phases.
+    """
+    timeout = parameters.get("timeout", DEFAULT_TIMEOUT_SECONDS)
+    phases = {
+        "connect": parameters.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT_SECONDS),
+        "read": parameters.get("read_timeout", DEFAULT_READ_TIMEOUT_SECONDS),
+        "write": parameters.get("write_timeout", DEFAULT_WRITE_TIMEOUT_SECONDS),
+        "pool": parameters.get("pool_timeout", DEFAULT_POOL_TIMEOUT_SECONDS),
+    }
+    return httpx.Timeout(timeout, **{phase: timeout if value is None else value for phase, value in phases.items()})
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_client(
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+    http2: bool = DEFAULT_HTTP2,
+) -> httpx.AsyncClient:
+    """Create a new pooled client with keep-alive enabled."""
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return httpx.AsyncClient(limits=limits, http2=http2)
+
+
+async def _aclose_quietly(client: httpx.AsyncClient):
+    try:
+        await client.aclose()
+    except Exception as e:
+        # Its event loop may already be closed, the sockets are then freed with the client
+        logger.debug(f"Error closing a replaced client: {e}")
+
+
+def _close_stale_client(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+    """Close a shared client replaced because it is bound to another event loop."""
+    if client.is_closed:
+        return
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(_aclose_quietly(client), loop)
+        return
+    task = asyncio.ensure_future(_aclose_quietly(client))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+def acquire_client(**options) -> httpx.AsyncClient:
+    """Return the shared pooled client, creating it on first use.
+
+    Every call must be paired with a call to `release_client`. The options
+    only apply when the client is created; later callers reuse the pool.
+    """
+    global _shared_client, _shared_client_loop
+    loop = asyncio.get_running_loop()
+    if _shared_client is None or _shared_client.is_closed or _shared_client_loop is not loop:
+        # A client is bound to the event loop it was first used on, the one it replaces is closed
+        if _shared_client is not None:
+            _close_stale_client(_shared_client, _shared_client_loop)
+        _shared_client = create_client(**options)
+        _shared_client_loop = loop
+    return _shared_client
+
+
+async def release_client(client: httpx.AsyncClient):
+    """Release a client obtained from `acquire_client`.
+
+    The shared client stays open so the next query reuses its warm
+    connections; `close_client` closes it, e.g. when the application shuts
+    down. Idle connections are dropped by the pool after `keepalive_expiry`.
+    """
+    if client is not _shared_client and not client.is_closed:
+        # The shared client was replaced (e.g. new event loop), close the stale one
+        await client.aclose()
+
+
+async def close_client():
+    """Close the shared client."""
+    global _shared_client, _shared_client_loop
+    client = _shared_client
+    _shared_client = None
+    _shared_client_loop = None
+    if client is not None and not client.is_closed:
+        await client.aclose()
@@ -0,0 +1,134 @@
+import asyncio
+import sys
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional
+from .buffer import ItemBuffer
+from .registry import Registry
+
+# Fetch coalescing configuration
+DEFAULT_MAX_FLIGHT_SIZE = 1000  # Cap on the combined size of one coalesced request
+
+
+class FetchRequest:
+    """Demand of one consumer waiting on a coordinated fetch."""
+
+    def __init__(self, buffer: ItemBuffer, size: int, future: asyncio.Future):
+        self.buffer = buffer
+        self.size = size
+        self.delivered = 0
+        self.future = future
+
+    @property
+    def needed(self) -> int:
+        return self.size - self.delivered
+
+
+class FetchCoordinator:
+    """Coalesce the fetches of concurrent consumers into single upstream requests.
+
+    Consumers call `fetch` with their own buffer and the number of items they
+    want. Only one request is in flight at a time; its size is the combined
+    demand of everyone waiting (up to `max_flight_size`), and consumers that
+    arrive while it runs simply join it. The items it returns are dealt out
+    round-robin among the waiting consumers, one at a time, so a short batch
+    is shared fairly, and each consumer gets at most what it asked for. Items
+    nobody is waiting for any more are kept and handed out first next time.
+
+    The request is made with the `fetch_into` callable of the consumer that
+    started it, so consumers coalesced under one coordinator should use the
+    same fetch options.
+    """
+
+    def __init__(self, max_flight_size: int = DEFAULT_MAX_FLIGHT_SIZE):
+        self.max_flight_size = max(1, max_flight_size)
+        self.requests: List[FetchRequest] = []
+        self.leftovers: Deque = deque()
+        self.flights = 0
+        self._flight: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _deliver(self, request: FetchRequest, items: Deque):
+        while items and request.needed > 0:
+            request.buffer.put_nowait(items.popleft())
+            request.delivered += 1
+
+    def _deal(self, items: Deque, requests: List[FetchRequest]):
+        """Hand out items one at a time to each request in turn."""
+        while items:
+            hungry = [request for request in requests if request.needed > 0]
+            if not hungry:
+                break
+            for request in hungry:
+                if not items:
+                    break
+                request.buffer.put_nowait(items.popleft())
+                request.delivered += 1
+
+    async def fetch(self, buffer: ItemBuffer, size: int, fetch_into: Callable[[int, ItemBuffer], Awaitable[int]]) -> int:
+        """Add up to `size` items to `buffer` from a shared request and return how many were added."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # State left over from another event loop cannot be awaited here
+            self.requests = []
+            self._flight = None
+            self._loop = loop
+        request = FetchRequest(buffer, size, loop.create_future())
+        self._deliver(request, self.leftovers)
+        if request.needed <= 0:
+            return request.delivered
+        self.requests.append(request)
+        if self._flight is None:
+            self._flight = asyncio.create_task(self._fly(fetch_into))
+        try:
+            await request.future
+        finally:
+            if request in self.requests:
+                self.requests.remove(request)
+            if not self.requests and self._flight is not None:
+                # Nobody is waiting any more, stop the request on their behalf
+                self._flight.cancel()
+                self._flight = None
+        return request.delivered
+
+    async def _fly(self, fetch_into: Callable[[int, ItemBuffer], Awaitable[int]]):
+        try:
+            while self.requests:
+                joined = list(self.requests)
+                size = min(self.max_flight_size, sum(request.needed for request in joined))
+                # Only drained once the request is done, and upstreams may send more than asked for
+                staging = ItemBuffer(capacity=sys.maxsize)
+                self.flights += 1
+                try:
+                    await fetch_into(size, staging)
+                except Exception as e:
+                    for request in joined:
+                        if request in self.requests:
+                            self.requests.remove(request)
+                        if not request.future.done():
+                            request.future.set_exception(e)
+                    continue
+                items = deque(staging.pop_many(len(staging)))
+                # Consumers that arrived during the request share its items too
+                self._deal(items, list(self.requests))
+                self.leftovers.extend(items)
+                for request in list(self.requests):
+                    if request in joined or request.delivered:
+                        self.requests.remove(request)
+                        if not request.future.done():
+                            request.future.set_result(request.delivered)
+        except asyncio.CancelledError:
+            pass  # The last waiting consumer went away
+        finally:
+            if self._flight is asyncio.current_task():
+                self._flight = None
+
+
+_coordinators: "Registry[FetchCoordinator]" = Registry()
+
+
+def get_coordinator(name: str = "default", max_flight_size: int = DEFAULT_MAX_FLIGHT_SIZE) -> FetchCoordinator:
+    """Return the process-wide coordinator called `name` with the given flight size cap.
+
+    Queries only coalesce with queries that use the same name and cap.
+    """
+    return _coordinators.get((name, max_flight_size), lambda: FetchCoordinator(max_flight_size))
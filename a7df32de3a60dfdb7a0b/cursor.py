@@ -0,0 +1,103 @@
+import json
+import logging
+import time
+from typing import Dict, Optional, Set
+from .dates import tweet_created_at
+from .dedup import write_atomically
+from .registry import Registry
+
+logger = logging.getLogger(__name__)
+
+# Cursor configuration
+DEFAULT_CURSOR_SAVE_INTERVAL = 5.0  # Seconds between saves of an advancing cursor
+
+
+class Cursor:
+    """High-water mark of the tweets a query profile has yielded.
+
+    Tracks the latest `created_at` yielded (in UTC, so tweets with different
+    offsets compare in order), the external ids yielded with that same
+    timestamp and the external id of the last one. They are sent
+    to the upstream as `since` and `cursor` so it can leave out what was
+    already processed, and tweets older than the mark are skipped locally
+    for upstreams that ignore them. The mark only advances as items are
+    yielded, so buffered items that were never handed out are not skipped
+    next time. With a `path`, the mark is saved there at most every
+    `save_interval` seconds and when the query ends, and a restarted worker
+    resumes from it.
+    """
+
+    def __init__(self, path: Optional[str] = None, save_interval: float = DEFAULT_CURSOR_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self.created_at: Optional[str] = None
+        self.external_id: Optional[str] = None
+        self._ids_at_mark: Set[str] = set()
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        if path is not None:
+            self.load()
+
+    def is_new(self, tweet: Dict) -> bool:
+        """Return False for a raw tweet at or behind the mark that was already yielded."""
+        try:
+            # Converted even without a mark, so its record knows the UTC time to advance the mark to
+            created_at = tweet_created_at(tweet)[1]
+        except ValueError:
+            return True  # Left to the transform to deal with
+        if self.created_at is None:
+            return True
+        if created_at != self.created_at:
+            return created_at > self.created_at
+        return tweet.get("external_id_", "") not in self._ids_at_mark
+
+    def advance(self, created_at: str, external_id: str):
+        """Move the mark past a yielded item created at `created_at` in UTC."""
+        if self.created_at is not None and created_at < self.created_at:
+            return
+        if created_at != self.created_at:
+            self.created_at = created_at
+            self._ids_at_mark = set()
+        self._ids_at_mark.add(external_id)
+        self.external_id = external_id
+        self._dirty = True
+        if self.path is not None and time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def upstream_fields(self) -> Dict:
+        """Fields of the /get_tweets request body asking only for tweets after the mark."""
+        if self.created_at is None:
+            return {}
+        return {"since": self.created_at, "cursor": self.external_id}
+
+    def save(self):
+        """Persist the mark to `path` if it moved since the last save."""
+        if self.path is None or not self._dirty:
+            return
+        state = {"created_at": self.created_at, "external_id": self.external_id, "ids_at_mark": sorted(self._ids_at_mark)}
+        write_atomically(self.path, json.dumps(state))
+        self._saved_at = time.monotonic()
+        self._dirty = False
+
+    def load(self):
+        """Restore the mark from `path` if it exists."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load cursor from '{self.path}': {e}")
+            return
+        self.created_at = state.get("created_at")
+        self.external_id = state.get("external_id")
+        self._ids_at_mark = set(state.get("ids_at_mark", []))
+
+
+# Concurrent queries of a profile advance the same mark
+_cursors: "Registry[Cursor]" = Registry()
+
+
+def get_cursor(profile: str = "default", path: Optional[str] = None) -> Cursor:
+    """Return the process-wide cursor of the query profile `profile`."""
+    return _cursors.get((profile, path), lambda: Cursor(path))
@@ -0,0 +1,106 @@
+import calendar
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+TWITTER_DATE_FORMAT = "%a %b %d %H:%M:%S %z %Y"
+CREATED_AT_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+CONVERTED_KEY = "_created_at"  # Where a raw tweet keeps its converted timestamps
+UTC_OFFSETS = frozenset(("+0000", "-0000"))
+
+WEEKDAYS = frozenset(("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"))
+MONTHS = {
+    "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04", "May": "05", "Jun": "06",
+    "Jul": "07", "Aug": "08", "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12",
+}
+
+
+def format_created_at_slow(dt_str: str) -> str:
+    """Reference conversion through strptime/strftime."""
+    dt = datetime.strptime(dt_str, TWITTER_DATE_FORMAT)
+    return dt.strftime(CREATED_AT_FORMAT)
+
+
+@lru_cache(maxsize=64)
+def _valid_offset(offset: str) -> bool:
+    # "+hhmm" or "-hhmm" with an offset strictly below 24 hours
+    return (
+        offset[0] in "+-"
+        and offset[1:].isdigit()
+        and int(offset[1:3]) < 24
+        and offset[3] in "012345"
+    )
+
+
+@lru_cache(maxsize=4096)
+def _days_in_month(year: int, month: int) -> int:
+    return calendar.monthrange(year, month)[1]
+
+
+def format_created_at(dt_str: str) -> str:
+    """Format a Twitter created_at string ("Wed Oct 10 20:19:24 +0000 2018").
+
+    Well-formed values are converted by slicing the fixed-width layout;
+    anything else goes through strptime, so the result and the errors raised
+    are identical to `format_created_at_slow`. Like strftime, the local time
+    is kept as is and the offset is not applied.
+    """
+    if (
+        len(dt_str) == 30
+        and dt_str.isascii()
+        and dt_str[3] == " " and dt_str[7] == " " and dt_str[10] == " "
+        and dt_str[13] == ":" and dt_str[16] == ":"
+        and dt_str[19] == " " and dt_str[25] == " "
+        and dt_str[:3] in WEEKDAYS
+    ):
+        month = MONTHS.get(dt_str[4:7])
+        day = dt_str[8:10]
+        hour = dt_str[11:13]
+        minute = dt_str[14:16]
+        second = dt_str[17:19]
+        year = dt_str[26:30]
+        if (
+            month is not None
+            and day.isdigit() and hour.isdigit() and minute.isdigit()
+            and second.isdigit() and year.isdigit()
+            and _valid_offset(dt_str[20:25])
+            and hour < "24" and minute < "60" and second < "60"
+            and year != "0000"
+            and 1 <= int(day) <= _days_in_month(int(year), int(month))
+        ):
+            return f"{year}-{month}-{day}T{hour}:{minute}:{second}.000000Z"
+    return format_created_at_slow(dt_str)
+
+
+def format_created_at_batch(values: Iterable[str]) -> List[str]:
+    """Convert a whole response's created_at strings, converting repeated values once."""
+    converted: Dict[str, str] = {}
+    results = []
+    for value in values:
+        result = converted.get(value)
+        if result is None:
+            result = converted[value] = format_created_at(value)
+        results.append(result)
+    return results
+
+
+def convert_created_at(dt_str: str) -> Tuple[str, str]:
+    """Return the `format_created_at` value of `dt_str` and the same moment in UTC.
+
+    The first keeps the local time like the Items always did; the second
+    applies the offset, so timestamps with different offsets compare in the
+    right order. For the usual "+0000" offset both are the same string.
+    """
+    created_at = format_created_at(dt_str)
+    if len(dt_str) == 30 and dt_str[20:25] in UTC_OFFSETS:
+        return created_at, created_at
+    moment = datetime.strptime(dt_str, TWITTER_DATE_FORMAT).astimezone(timezone.utc)
+    return created_at, moment.strftime(CREATED_AT_FORMAT)
+
+
+def tweet_created_at(tweet: Dict) -> Tuple[str, str]:
+    """`convert_created_at` of a raw tweet's created_at, converted on first use and kept on the tweet."""
+    converted = tweet.get(CONVERTED_KEY)
+    if converted is None:
+        converted = tweet[CONVERTED_KEY] = convert_created_at(tweet.get("created_at_", ""))
+    return converted
@@ -0,0 +1,238 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional, Union
+from .registry import Registry
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+logger = logging.getLogger(__name__)
+
+# Deduplication configuration
+DEFAULT_DEDUP_CAPACITY = 100_000  # Identifiers remembered at once
+DEFAULT_DEDUP_TTL_SECONDS = None  # Forget identifiers older than this (LRU only)
+DEFAULT_DEDUP_ERROR_RATE = 0.001  # False positive rate of the Bloom filter
+
+
+def write_atomically(path: str, data: str):
+    """Replace the file at `path` with `data`, so readers never see a partly written file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_state(path: str, state: Dict):
+    state = {key: base64.b64encode(value).decode("ascii") if isinstance(value, bytes) else value for key, value in state.items()}
+    write_atomically(path, json.dumps(state))
+
+
+def _next_prime(n: int) -> int:
+    while any(n % d == 0 for d in range(2, math.isqrt(n) + 1)):
+        n += 1
+    return n
+
+
+class SeenIds:
+    """Bounded set of recently seen identifiers, evicting the least recently seen.
+
+    With a `ttl`, identifiers are also forgotten once they are older than the
+    window. Exact, at the cost of storing every identifier in the window.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_DEDUP_CAPACITY, ttl: Optional[float] = DEFAULT_DEDUP_TTL_SECONDS, path: Optional[str] = None):
+        self.capacity = max(1, capacity)
+        self.ttl = ttl
+        self.path = path
+        self._seen: "OrderedDict[str, float]" = OrderedDict()  # Identifier -> wall clock time last seen
+        self._dirty = False
+        if path is not None:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __contains__(self, key: str) -> bool:
+        self._expire(time.time())
+        return key in self._seen
+
+    def _expire(self, now: float):
+        if self.ttl is None:
+            return
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if now - seen_at <= self.ttl:
+                break
+            del self._seen[key]
+
+    def add(self, key: str) -> bool:
+        """Record `key` and return True if it was not seen within the window."""
+        now = time.time()
+        self._expire(now)
+        is_new = key not in self._seen
+        self._seen[key] = now
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+        self._dirty = True
+        return is_new
+
+    def snapshot(self) -> Optional[Dict]:
+        """Copy of the window to persist, None without a `path` or when it did not change since the last one."""
+        if self.path is None or not self._dirty:
+            return None
+        self._dirty = False
+        return {"kind": "lru", "seen": list(self._seen.items())}
+
+    def save(self):
+        """Persist the window to `path` if it changed."""
+        state = self.snapshot()
+        if state is not None:
+            _write_state(self.path, state)
+
+    def load(self):
+        """Restore the window from `path` if it exists."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load deduplication state from '{self.path}': {e}")
+            return
+        if state.get("kind") != "lru":
+            logger.warning(f"Ignoring deduplication state of another kind in '{self.path}'.")
+            return
+        self._seen = OrderedDict((key, seen_at) for key, seen_at in state.get("seen", [])[-self.capacity:])
+        self._expire(time.time())
+
+
+class BloomFilter:
+    """Probabilistic set of identifiers with a configurable false positive rate.
+
+    Memory is fixed by `capacity` and `error_rate`. To stay within the error
+    rate, the filter rotates into a fresh generation once `capacity` keys were
+    added; the previous generation is still checked, so the window always
+    covers at least the last `capacity` identifiers.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_DEDUP_CAPACITY, error_rate: float = DEFAULT_DEDUP_ERROR_RATE, path: Optional[str] = None):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.path = path
+        self.num_bits = _next_prime(max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.count = 0
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._dirty = False
+        if path is not None:
+            self.load()
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        return self._contains(self._current, positions) or self._contains(self._previous, positions)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        # A step that is nonzero modulo the prime bit count sends every probe to a different bit
+        h2 = 1 + int.from_bytes(digest[8:], "little") % (self.num_bits - 1)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _contains(bits: bytearray, positions) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add(self, key: str) -> bool:
+        """Record `key` and return True if it was (probably) not seen before."""
+        positions = self._positions(key)
+        if self._contains(self._current, positions) or self._contains(self._previous, positions):
+            return False
+        if self.count >= self.capacity:
+            self._previous = self._current
+            self._current = bytearray(len(self._previous))
+            self.count = 0
+        for p in positions:
+            self._current[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+        self._dirty = True
+        return True
+
+    def snapshot(self) -> Optional[Dict]:
+        """Copy of both generations to persist, None without a `path` or when they did not change since the last one."""
+        if self.path is None or not self._dirty:
+            return None
+        self._dirty = False
+        return {
+            "kind": "bloom",
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "count": self.count,
+            "current": bytes(self._current),
+            "previous": bytes(self._previous),
+        }
+
+    def save(self):
+        """Persist both generations to `path` if they changed."""
+        state = self.snapshot()
+        if state is not None:
+            _write_state(self.path, state)
+
+    def load(self):
+        """Restore both generations from `path` if it matches this configuration."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load deduplication state from '{self.path}': {e}")
+            return
+        if state.get("kind") != "bloom" or state.get("num_bits") != self.num_bits or state.get("num_hashes") != self.num_hashes:
+            logger.warning(f"Ignoring deduplication state with another configuration in '{self.path}'.")
+            return
+        self.count = state["count"]
+        self._current = bytearray(base64.b64decode(state["current"]))
+        self._previous = bytearray(base64.b64decode(state["previous"]))
+
+
+# Saves run on one worker thread, so they never block the event loop and land in order
+_writer: Optional["Executor"] = None
+
+
+async def save_in_background(deduplicator: Union[SeenIds, BloomFilter]):
+    """Persist `deduplicator` like `save`, serializing and writing its snapshot off the event loop."""
+    global _writer
+    state = deduplicator.snapshot()
+    if state is None:
+        return
+    if _writer is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedup-save")
+    await asyncio.get_running_loop().run_in_executor(_writer, _write_state, deduplicator.path, state)
+
+
+_deduplicators: "Registry[Union[SeenIds, BloomFilter]]" = Registry()
+
+
+def get_deduplicator(
+    kind: str = "lru",
+    capacity: int = DEFAULT_DEDUP_CAPACITY,
+    ttl: Optional[float] = DEFAULT_DEDUP_TTL_SECONDS,
+    error_rate: float = DEFAULT_DEDUP_ERROR_RATE,
+    path: Optional[str] = None,
+):
+    """Return the process-wide deduplicator for the given configuration."""
+    if kind == "lru":
+        return _deduplicators.get((kind, capacity, ttl, path), lambda: SeenIds(capacity, ttl, path))
+    if kind == "bloom":
+        return _deduplicators.get((kind, capacity, error_rate, path), lambda: BloomFilter(capacity, error_rate, path))
+    raise ValueError(f"Unknown deduplication kind '{kind}', expected 'lru' or 'bloom'.")
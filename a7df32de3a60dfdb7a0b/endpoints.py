@@ -0,0 +1,114 @@
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from .retry import CircuitBreaker
+from .ratelimit import TokenBucket, DEFAULT_RATE_LIMIT, DEFAULT_RATE_BURST
+from .batching import BatchSizer
+from .registry import Registry
+
+# Endpoint configuration
+DEFAULT_ENDPOINTS = ["http://169.254.100.180:8080/get_tweets"]
+DEFAULT_COOLDOWN_SECONDS = 30  # Time a failing endpoint is kept out of rotation
+DEFAULT_LATENCY_SECONDS = 1.0  # Assumed latency of an endpoint before it answers
+LATENCY_SMOOTHING = 0.3  # Weight of the newest sample in the latency average
+
+
+class Endpoint:
+    """Live health statistics of one /get_tweets endpoint."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency = DEFAULT_LATENCY_SECONDS
+        self.errors = 0  # Consecutive failures
+        self.in_flight = 0
+        self.down_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def score(self) -> float:
+        """Lower is better: latency weighted by load and recent errors."""
+        return self.latency * (1 + self.in_flight) * (1 + self.errors)
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.url!r}, latency={self.latency:.3f}, errors={self.errors}, in_flight={self.in_flight})"
+
+
+class EndpointPool:
+    """Route requests across several endpoints by latency and error score.
+
+    An endpoint that fails is taken out of rotation for a cooldown that grows
+    with its consecutive failures; after the cooldown it gets a trial request
+    and rejoins the rotation on success.
+    """
+
+    def __init__(self, urls: Sequence[str], cooldown: float = DEFAULT_COOLDOWN_SECONDS, limiter: Optional[TokenBucket] = None):
+        if not urls:
+            raise ValueError("At least one endpoint is required.")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.cooldown = cooldown
+        self.breaker = CircuitBreaker()  # Opens when the upstream as a whole keeps failing
+        self.limiter = limiter if limiter is not None else TokenBucket()  # Paces requests to the upstream, shared by every query using the pool
+        self.batch_sizers: Dict[Tuple[int, int, int, float], BatchSizer] = {}  # Learned batch sizes per configuration
+
+    def available(self) -> List[Endpoint]:
+        """Endpoints currently in rotation, best first."""
+        now = time.monotonic()
+        return sorted((e for e in self.endpoints if e.available(now)), key=Endpoint.score)
+
+    def choose(self, exclude: Iterable[Endpoint] = ()) -> Endpoint:
+        """Pick the best endpoint, preferring ones not in `exclude`.
+
+        When every endpoint is out of rotation, the one that recovers first is
+        returned so callers can keep probing.
+        """
+        exclude = set(map(id, exclude))
+        candidates = self.available()
+        preferred = [e for e in candidates if id(e) not in exclude]
+        if preferred:
+            return preferred[0]
+        if candidates:
+            return candidates[0]
+        return min(self.endpoints, key=lambda e: e.down_until)
+
+    def record_success(self, endpoint: Endpoint, latency: float):
+        endpoint.latency += LATENCY_SMOOTHING * (latency - endpoint.latency)
+        endpoint.errors = 0
+        endpoint.down_until = 0.0
+
+    def record_failure(self, endpoint: Endpoint):
+        endpoint.errors += 1
+        endpoint.down_until = time.monotonic() + self.cooldown * min(endpoint.errors, 10)
+
+    def batch_sizer(self, initial: int, min_size: int, max_size: int, target_latency: float) -> BatchSizer:
+        """Return the pool's batch sizer for the given configuration, so later queries start from what it learned."""
+        key = (initial, min_size, max_size, target_latency)
+        sizer = self.batch_sizers.get(key)
+        if sizer is None:
+            sizer = self.batch_sizers[key] = BatchSizer(initial, min_size, max_size, target_latency)
+        return sizer
+
+    def split(self, size: int, fanout: Optional[int] = None) -> List[Tuple[Endpoint, int]]:
+        """Split a batch of `size` items across the best available endpoints."""
+        candidates = self.available() or [self.choose()]
+        if fanout is not None:
+            candidates = candidates[:max(1, fanout)]
+        candidates = candidates[:max(1, size)]
+        share, extra = divmod(size, len(candidates))
+        return [(endpoint, share + (1 if i < extra else 0)) for i, endpoint in enumerate(candidates)]
+
+
+_pools: "Registry[EndpointPool]" = Registry()
+
+
+def get_endpoint_pool(
+    urls: Union[str, Sequence[str], None] = None,
+    rate_limit: Optional[float] = DEFAULT_RATE_LIMIT,
+    rate_burst: int = DEFAULT_RATE_BURST,
+) -> EndpointPool:
+    """Return the process-wide pool for the given endpoint URL or URLs, paced at `rate_limit`."""
+    if urls is None:
+        urls = DEFAULT_ENDPOINTS
+    elif isinstance(urls, str):
+        urls = [urls]
+    urls = tuple(urls)
+    return _pools.get((urls, rate_limit, rate_burst), lambda: EndpointPool(urls, limiter=TokenBucket(rate_limit, rate_burst)))
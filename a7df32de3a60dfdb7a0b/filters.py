@@ -0,0 +1,166 @@
+import re
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Union
+from .dates import CREATED_AT_FORMAT, tweet_created_at
+
+# Filter configuration
+DEFAULT_MIN_LENGTH = 0  # Characters of stripped content a tweet needs
+DEFAULT_FILTER_PUSHDOWN = False  # Also send the filters in the /get_tweets request body
+
+
+class KeywordMatcher:
+    """Case-insensitive substring matcher for a whole set of keywords at once.
+
+    The keywords are compiled into an Aho-Corasick automaton whose failure
+    links are folded into the transition table, so scanning a text is one
+    dictionary lookup per character however many keywords there are.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted({keyword.lower() for keyword in keywords if keyword})
+        self._transitions: List[Dict[str, int]] = [{}]
+        self._accepting: List[bool] = [False]
+        for keyword in self.keywords:
+            state = 0
+            for char in keyword:
+                following = self._transitions[state].get(char)
+                if following is None:
+                    following = len(self._transitions)
+                    self._transitions[state][char] = following
+                    self._transitions.append({})
+                    self._accepting.append(False)
+                state = following
+            self._accepting[state] = True
+        self._link()
+
+    def _link(self):
+        # Breadth first, so the failure state of every parent is complete before its children
+        failure = [0] * len(self._transitions)
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            fallback = self._transitions[failure[state]]
+            self._accepting[state] = self._accepting[state] or self._accepting[failure[state]]
+            for char, following in list(self._transitions[state].items()):
+                failure[following] = fallback.get(char, 0)
+                queue.append(following)
+            for char, following in fallback.items():
+                # Characters without an edge of their own go where the failure state would
+                self._transitions[state].setdefault(char, following)
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def search(self, text: str) -> bool:
+        """Return True if `text` contains any of the keywords."""
+        if not self.keywords:
+            return False
+        transitions = self._transitions
+        accepting = self._accepting
+        state = 0
+        for char in text.lower():
+            state = transitions[state].get(char, 0)
+            if accepting[state]:
+                return True
+        return False
+
+
+def parse_since(value: Union[str, float, datetime, None]) -> Optional[str]:
+    """Normalize a `since` value (datetime, epoch seconds or ISO 8601 string) to the created_at format in UTC."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        moment = datetime.fromtimestamp(value, timezone.utc)
+    elif isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime(CREATED_AT_FORMAT)
+
+
+class TweetFilter:
+    """Decide on raw tweets whether they are worth building an Item for.
+
+    A tweet is kept when its stripped content has at least `min_length`
+    characters, its domain is one of `domains`, it was created at or after
+    `since`, and its content contains one of `keywords` (case-insensitive) or
+    matches one of the `patterns` regular expressions; unset criteria accept
+    everything. The cheapest checks run first and the timestamp is only
+    converted for tweets that passed them; it is compared in UTC and kept on
+    the tweet for the transform to reuse. With `pushdown`, the criteria are
+    also sent to the upstream so it can leave out non-matching tweets; they
+    still apply locally for upstreams that ignore them.
+    """
+
+    def __init__(
+        self,
+        keywords: Optional[Iterable[str]] = None,
+        patterns: Optional[Iterable[str]] = None,
+        min_length: int = DEFAULT_MIN_LENGTH,
+        domains: Optional[Iterable[str]] = None,
+        since: Union[str, float, datetime, None] = None,
+        pushdown: bool = DEFAULT_FILTER_PUSHDOWN,
+    ):
+        self.matcher = KeywordMatcher(keywords) if keywords else None
+        self.patterns = list(patterns) if patterns else []
+        # One alternation scans the text once instead of once per pattern
+        self._pattern = re.compile("|".join(f"(?:{pattern})" for pattern in self.patterns)) if self.patterns else None
+        self.min_length = min_length
+        self.domains = frozenset(domain.lower() for domain in domains) if domains else None
+        self.since = parse_since(since)
+        self.pushdown = pushdown
+
+    def __bool__(self) -> bool:
+        return bool(self.min_length > 0 or self.domains or self.since or self.matcher or self._pattern)
+
+    def accept(self, tweet: Dict, content: str) -> bool:
+        """Return True if the tweet with stripped `content` passes every criterion."""
+        if len(content) < self.min_length:
+            return False
+        if self.domains is not None and tweet.get("domain_", "x.com").lower() not in self.domains:
+            return False
+        if self.since is not None:
+            try:
+                if tweet_created_at(tweet)[1] < self.since:
+                    return False
+            except ValueError:
+                return False
+        if self.matcher is None and self._pattern is None:
+            return True
+        return bool(
+            (self.matcher is not None and self.matcher.search(content))
+            or (self._pattern is not None and self._pattern.search(content))
+        )
+
+    def upstream_fields(self) -> Dict:
+        """Fields of the /get_tweets request body asking the upstream to filter, empty without `pushdown`."""
+        if not self.pushdown:
+            return {}
+        fields = {}
+        if self.matcher is not None:
+            fields["keywords"] = self.matcher.keywords
+        if self.patterns:
+            fields["patterns"] = self.patterns
+        if self.min_length > 0:
+            fields["min_length"] = self.min_length
+        if self.domains is not None:
+            fields["domains"] = sorted(self.domains)
+        if self.since is not None:
+            fields["since"] = self.since
+        return fields
+
+
+def filter_options(parameters: Dict) -> Optional[TweetFilter]:
+    """Build the query's TweetFilter from its parameters, None when nothing is filtered."""
+    tweet_filter = TweetFilter(
+        keywords=parameters.get("keywords"),
+        patterns=parameters.get("patterns"),
+        min_length=parameters.get("min_length", DEFAULT_MIN_LENGTH),
+        domains=parameters.get("domains"),
+        since=parameters.get("since"),
+        pushdown=parameters.get("filter_pushdown", DEFAULT_FILTER_PUSHDOWN),
+    )
+    return tweet_filter if tweet_filter else None
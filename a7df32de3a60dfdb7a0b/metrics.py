@@ -0,0 +1,132 @@
+import bisect
+from typing import Dict, List, Sequence
+
+# Process-wide runtime metrics, exposed as a snapshot dict or in Prometheus text format
+METRIC_PREFIX = "tweets_client_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def reset(self):
+        self.value = 0
+
+    def snapshot(self):
+        return self.value
+
+    def prometheus_lines(self) -> List[str]:
+        return [f"{METRIC_PREFIX}{self.name} {self.value}"]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: int = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Histogram:
+    """Distribution of observations over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float]):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.reset()
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def snapshot(self) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+    def prometheus_lines(self) -> List[str]:
+        name = f"{METRIC_PREFIX}{self.name}"
+        lines = [f'{name}_bucket{{le="{bound}"}} {count}' for bound, count in self.snapshot()["buckets"].items()]
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+ITEMS_FETCHED = Counter("items_fetched_total", "Raw tweets received from /get_tweets.")
+ITEMS_YIELDED = Counter("items_yielded_total", "Items yielded to consumers.")
+ITEMS_SKIPPED = Counter("items_skipped_total", "Tweets skipped because their content was empty.")
+ITEMS_DUPLICATE = Counter("items_duplicate_total", "Tweets dropped as already seen.")
+ITEMS_FILTERED = Counter("items_filtered_total", "Tweets rejected by the query's filters.")
+ITEMS_NEAR_DUPLICATE = Counter("items_near_duplicate_total", "Tweets dropped or tagged as near duplicates of recent content.")
+ITEMS_STALE = Counter("items_stale_total", "Tweets skipped as already behind the query's cursor.")
+FETCH_RETRIES = Counter("fetch_retries_total", "Failed /get_tweets requests that were retried.")
+SUBSCRIPTION_RECONNECTS = Counter("subscription_reconnects_total", "Push subscriptions that were reopened after ending.")
+FETCH_THROTTLED = Counter("fetch_throttled_total", "/get_tweets requests answered with 429 Too Many Requests.")
+FETCH_LATENCY = Histogram("fetch_latency_seconds", "Duration of successful /get_tweets requests.", LATENCY_BUCKETS)
+FETCH_BATCH_SIZE = Histogram("fetch_batch_size", "Tweets received per /get_tweets response.", BATCH_SIZE_BUCKETS)
+BUFFER_DEPTH = Gauge("buffer_depth", "Items currently buffered across all queries.")
+
+ALL_METRICS = [
+    ITEMS_FETCHED,
+    ITEMS_YIELDED,
+    ITEMS_SKIPPED,
+    ITEMS_DUPLICATE,
+    ITEMS_FILTERED,
+    ITEMS_NEAR_DUPLICATE,
+    ITEMS_STALE,
+    FETCH_RETRIES,
+    FETCH_THROTTLED,
+    SUBSCRIPTION_RECONNECTS,
+    FETCH_LATENCY,
+    FETCH_BATCH_SIZE,
+    BUFFER_DEPTH,
+]
+
+
+def snapshot() -> Dict:
+    """Current value of every metric, keyed by name."""
+    return {metric.name: metric.snapshot() for metric in ALL_METRICS}
+
+
+def prometheus_text() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.append(f"# HELP {METRIC_PREFIX}{metric.name} {metric.description}")
+        lines.append(f"# TYPE {METRIC_PREFIX}{metric.name} {metric.kind}")
+        lines.extend(metric.prometheus_lines())
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Reset every metric, except gauges which reflect live state."""
+    for metric in ALL_METRICS:
+        if metric.kind != "gauge":
+            metric.reset()
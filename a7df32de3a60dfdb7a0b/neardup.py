@@ -0,0 +1,164 @@
+import hashlib
+import re
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .registry import Registry
+
+# Near-duplicate detection configuration
+DEFAULT_NEAR_DUP_THRESHOLD = 0.8  # Estimated Jaccard similarity of the word sets above which content is a near duplicate
+DEFAULT_NEAR_DUP_CAPACITY = 20_000  # Fingerprints remembered at once
+DEFAULT_NEAR_DUP_TTL_SECONDS = None  # Forget fingerprints older than this
+DEFAULT_NUM_PERM = 32  # MinHash values per fingerprint
+NEAR_DUP_ACTIONS = ("drop", "tag")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Retweet markers, mentions and links differ between copies of the same text
+NOISE_PATTERN = re.compile(r"https?://\S+|@\w+|^\s*rt\b")
+VALUES_PER_DIGEST = 32  # 16-bit hash values in one blake2b digest
+
+
+def tokens(content: str) -> List[str]:
+    """Distinct words of `content`, ignoring case, links, mentions and retweet markers."""
+    return list(set(TOKEN_PATTERN.findall(NOISE_PATTERN.sub(" ", content.lower()))))
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Split `num_perm` values into (bands, rows) so that pairs somewhat below `threshold` still become candidates."""
+    layouts = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    # A pair of similarity s shares a band with probability 1 - (1 - s^rows)^bands, which rises steeply around (1/bands)^(1/rows)
+    below = [(bands, rows) for bands, rows in layouts if (1 / bands) ** (1 / rows) <= threshold - 0.1]
+    return below[-1] if below else layouts[0]
+
+
+class MinHasher:
+    """MinHash fingerprints of word sets with `num_perm` 16-bit hash functions.
+
+    One 64 byte blake2b digest of a word holds 32 independent 16-bit hash
+    values, so a word costs a single digest per 32 hash functions instead of
+    one computation per function.
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        self.num_perm = num_perm
+        blocks = -(-num_perm // VALUES_PER_DIGEST)
+        self._salts = [f"{seed}:{block}".encode("ascii") for block in range(blocks)]
+
+    def __call__(self, words: List[str]) -> array:
+        rows = []
+        for word in words:
+            data = word.encode("utf-8")
+            row = array("H")
+            for salt in self._salts:
+                row.frombytes(hashlib.blake2b(data, digest_size=64, salt=salt).digest())
+            rows.append(row)
+        return array("H", map(min, zip(*rows)))[:self.num_perm]
+
+
+class NearDuplicateIndex:
+    """Bounded MinHash-LSH index of recently seen content.
+
+    `find` looks a fingerprint up by its bands; only texts sharing a band are
+    compared, so the cost per lookup does not grow with the size of the
+    index. A text whose estimated Jaccard similarity to an indexed one of
+    another key reaches `threshold` is a near duplicate. The index keeps the
+    latest `capacity` fingerprints, and with a `ttl` forgets the older ones.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_NEAR_DUP_THRESHOLD,
+        capacity: int = DEFAULT_NEAR_DUP_CAPACITY,
+        ttl: Optional[float] = DEFAULT_NEAR_DUP_TTL_SECONDS,
+        num_perm: int = DEFAULT_NUM_PERM,
+    ):
+        self.threshold = threshold
+        self.capacity = max(1, capacity)
+        self.ttl = ttl
+        self.minhash = MinHasher(num_perm)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self._min_equal = threshold * num_perm
+        self._next_id = 0
+        self._entries: "OrderedDict[int, Tuple[array, str, float]]" = OrderedDict()  # Id -> (fingerprint, key, time indexed)
+        self._keys: Dict[str, int] = {}  # Key -> id of its latest entry
+        self._buckets: List[Dict[int, int]] = [{} for _ in range(self.bands)]  # Band hash -> id of the latest entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_hashes(self, signature: array) -> List[int]:
+        rows = self.rows
+        return [hash(tuple(signature[i:i + rows])) for i in range(0, self.bands * rows, rows)]
+
+    def _remove(self, entry_id: int):
+        signature, key, _ = self._entries.pop(entry_id)
+        if self._keys.get(key) == entry_id:
+            del self._keys[key]
+        for buckets, band in zip(self._buckets, self._band_hashes(signature)):
+            if buckets.get(band) == entry_id:
+                del buckets[band]
+
+    def _expire(self, now: float):
+        if self.ttl is None:
+            return
+        while self._entries and now - next(iter(self._entries.values()))[2] > self.ttl:
+            self._remove(next(iter(self._entries)))
+
+    def fingerprint(self, content: str) -> Optional[array]:
+        """Return the MinHash fingerprint of the words of `content`, or None if it has none."""
+        words = tokens(content)
+        return self.minhash(words) if words else None
+
+    def find(self, signature: array, key: str = "") -> Optional[str]:
+        """Return the key of an indexed near duplicate of `signature` indexed under another key than `key`."""
+        self._expire(time.time())
+        for buckets, band in zip(self._buckets, self._band_hashes(signature)):
+            entry = self._entries.get(buckets.get(band))
+            # A refetched text is not a near duplicate of itself
+            if entry is not None and (not key or entry[1] != key) and sum(x == y for x, y in zip(signature, entry[0])) >= self._min_equal:
+                return entry[1]
+        return None
+
+    def add(self, signature: array, key: str = ""):
+        """Index `signature` under `key`, evicting the oldest fingerprints beyond `capacity`."""
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (signature, key, time.time())
+        if key:
+            self._keys[key] = entry_id
+        for buckets, band in zip(self._buckets, self._band_hashes(signature)):
+            buckets[band] = entry_id
+        while len(self._entries) > self.capacity:
+            self._remove(next(iter(self._entries)))
+
+    def pop(self, key: str) -> Optional[array]:
+        """Remove the latest fingerprint indexed under `key` and return it, or None if there is none."""
+        entry_id = self._keys.get(key)
+        if entry_id is None:
+            return None
+        signature = self._entries[entry_id][0]
+        self._remove(entry_id)
+        return signature
+
+    def check(self, content: str, key: str = "") -> Optional[str]:
+        """Return the key of an indexed near duplicate of `content`, or None after indexing it as new."""
+        signature = self.fingerprint(content)
+        if signature is None:
+            return None
+        original = self.find(signature, key)
+        if original is None:
+            self.add(signature, key)
+        return original
+
+
+_indexes: "Registry[NearDuplicateIndex]" = Registry()
+
+
+def get_near_duplicate_index(
+    threshold: float = DEFAULT_NEAR_DUP_THRESHOLD,
+    capacity: int = DEFAULT_NEAR_DUP_CAPACITY,
+    ttl: Optional[float] = DEFAULT_NEAR_DUP_TTL_SECONDS,
+) -> NearDuplicateIndex:
+    """Return the process-wide near-duplicate index for the given configuration."""
+    return _indexes.get((threshold, capacity, ttl), lambda: NearDuplicateIndex(threshold, capacity, ttl))
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Prefetch configuration
+DEFAULT_LOW_WATERMARK = 25  # Refill once fewer items than this are buffered
+DEFAULT_MAX_OUTSTANDING_FETCHES = 1  # Fetches allowed in flight at the same time
+
+
+class Prefetcher:
+    """Refill the item buffer in the background before it runs dry.
+
+    `fetch` is called with a batch size and must add up to that many items to
+    the buffer; `buffered` returns the number of items currently buffered.
+    `batch_size` is either a fixed size or a function of the number of items
+    still needed. Fetches run as tasks, so the next batch is already in flight
+    while the consumer drains the current one.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[int], Awaitable],
+        buffered: Callable[[], int],
+        batch_size: Union[int, Callable[[int], int]],
+        low_watermark: int = DEFAULT_LOW_WATERMARK,
+        max_outstanding: int = DEFAULT_MAX_OUTSTANDING_FETCHES,
+    ):
+        self.fetch = fetch
+        self.buffered = buffered
+        self.batch_size = batch_size
+        self.low_watermark = low_watermark
+        self.max_outstanding = max(1, max_outstanding)
+        self.pending: Dict[asyncio.Task, int] = {}  # Fetch task -> requested size
+
+    def refill(self, remaining: int):
+        """Start fetches while the buffer is low and `remaining` items are still wanted."""
+        while len(self.pending) < self.max_outstanding and self.buffered() <= self.low_watermark:
+            needed = remaining - self.buffered() - sum(self.pending.values())
+            if needed <= 0:
+                break  # Everything still wanted is buffered or on its way
+            size = self.batch_size(needed) if callable(self.batch_size) else self.batch_size
+            self.pending[asyncio.create_task(self.fetch(size))] = size
+
+    async def wait(self, ready: Optional[Awaitable] = None, timeout: Optional[float] = None):
+        """Wait for `ready` or for an outstanding fetch, at most `timeout` seconds, re-raising fetch errors."""
+        if not self.pending:
+            return
+        waiters = set(self.pending)
+        ready_task = None
+        if ready is not None:
+            ready_task = asyncio.ensure_future(ready)
+            waiters.add(ready_task)
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if ready_task is not None and not ready_task.done():
+                ready_task.cancel()
+        for task in done:
+            if task in self.pending:
+                del self.pending[task]
+                task.result()
+
+    async def close(self):
+        """Cancel fetches that are still in flight."""
+        for task in self.pending:
+            task.cancel()
+        if self.pending:
+            results = await asyncio.gather(*self.pending, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception) and not isinstance(result, asyncio.CancelledError):
+                    logger.error(f"Prefetch failed while closing: {result!r}")
+        self.pending = {}
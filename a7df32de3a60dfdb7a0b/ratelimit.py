@@ -0,0 +1,145 @@
+import asyncio
+import math
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+# Rate limit configuration
+DEFAULT_RATE_LIMIT = None  # Requests per second, None to only slow down when the upstream asks to
+DEFAULT_RATE_BURST = 10  # Requests that may be sent back to back
+DEFAULT_MIN_RATE = 1.0  # Floor of the rate after repeated 429 responses
+RATE_DECREASE_FACTOR = 0.5  # Applied to the rate on every 429 response
+RATE_RECOVERY_FACTOR = 1.25  # Applied to the rate on every successful response
+RATE_SMOOTHING = 0.2  # Weight of the newest interval in the observed request rate
+DEFAULT_THROTTLE_SECONDS = 1.0  # Pause after a 429 without a usable Retry-After
+REMAINING_HEADERS = ("ratelimit-remaining", "x-ratelimit-remaining")
+RESET_HEADERS = ("ratelimit-reset", "x-ratelimit-reset")
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay seconds or HTTP date), None if unusable."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+    return max(0.0, retry_at - (time.time() if now is None else now))
+
+
+def _header(headers: Mapping[str, str], names) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value.split(",")[0])
+            except ValueError:
+                return None
+    return None
+
+
+class TokenBucket:
+    """Adaptive token bucket pacing the requests sent to one upstream.
+
+    Up to `burst` requests go out back to back, after that they are spaced at
+    `rate` per second. The rate is adjusted while running: a 429 response
+    pauses every request for the Retry-After delay and halves the rate. With
+    no limit configured, the halving starts from the observed request rate,
+    and before any rate was observed only the pause applies. Each successful
+    response raises the rate again, up to the configured `max_rate`, or
+    without one back to unlimited once it passes the rate that was throttled.
+    `RateLimit-Remaining`/`RateLimit-Reset` headers (also with an `X-`
+    prefix) allow the requests left in the current window, in bursts of up
+    to `burst`, paced over the time until it resets.
+    """
+
+    def __init__(self, max_rate: Optional[float] = DEFAULT_RATE_LIMIT, burst: int = DEFAULT_RATE_BURST, min_rate: float = DEFAULT_MIN_RATE):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self.blocked_until = 0.0
+        self._interval: Optional[float] = None
+        self._last_acquired: Optional[float] = None
+        self._unthrottled_rate: Optional[float] = None  # Observed rate when an unlimited bucket was throttled
+
+    def _refill(self, now: float):
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a request may be sent."""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill(now)
+            if self.rate is None or self.tokens >= 1:
+                if self.rate is not None:
+                    self.tokens -= 1
+                break
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+        if self._last_acquired is not None:
+            interval = now - self._last_acquired
+            self._interval = interval if self._interval is None else (1 - RATE_SMOOTHING) * self._interval + RATE_SMOOTHING * interval
+        self._last_acquired = now
+
+    def observed_rate(self) -> Optional[float]:
+        """Smoothed rate at which requests have been sent, None before two requests."""
+        if self._interval is None:
+            return None
+        return 1 / self._interval if self._interval > 0 else float(self.burst)
+
+    def record_success(self, headers: Optional[Mapping[str, str]] = None):
+        """Speed back up after a successful response and follow its rate-limit headers."""
+        if self.rate is not None:
+            ceiling = self.max_rate if self.max_rate is not None else math.inf
+            self.rate = min(ceiling, self.rate * RATE_RECOVERY_FACTOR)
+            if self.max_rate is None and (self._unthrottled_rate is None or self.rate >= self._unthrottled_rate):
+                # Back at the pace the upstream pushed back on, so no limit is needed any more
+                self.rate = None
+                self._unthrottled_rate = None
+        if headers is None:
+            return
+        remaining = _header(headers, REMAINING_HEADERS)
+        reset = _header(headers, RESET_HEADERS)
+        if remaining is None or reset is None:
+            return
+        now = time.monotonic()
+        if reset > 1e9:
+            reset = max(0.0, reset - time.time())  # An epoch timestamp rather than a delay
+        if remaining < 1:
+            self.blocked_until = max(self.blocked_until, now + reset)
+        elif reset > 0:
+            window_rate = remaining / reset
+            if self.max_rate is not None:
+                window_rate = min(window_rate, self.max_rate)
+            self._refill(now)
+            self.rate = window_rate
+            # What is left of the window may go out right away, up to the burst
+            self.tokens = min(self.burst, remaining)
+
+    def record_throttled(self, retry_after: Optional[float] = None):
+        """Slow down after a 429 response, pausing all requests for `retry_after` seconds."""
+        self.throttled += 1
+        now = time.monotonic()
+        self._refill(now)
+        if now >= self.blocked_until:
+            # Requests already in flight when the pause started do not slow down further
+            current = self.rate if self.rate is not None else self.observed_rate()
+            if current is not None:
+                if self.max_rate is None and self._unthrottled_rate is None:
+                    self._unthrottled_rate = current
+                self.rate = max(min(self.min_rate, current), current * RATE_DECREASE_FACTOR)
+        self.tokens = min(self.tokens, 0.0)
+        pause = retry_after if retry_after is not None else DEFAULT_THROTTLE_SECONDS
+        self.blocked_until = max(self.blocked_until, now + pause)
@@ -0,0 +1,58 @@
+import sys
+from typing import Optional
+from exorde_data import Item, Content, Author, CreatedAt, Url, Domain, ExternalId, ExternalParentId
+
+
+class TweetRecord:
+    """Compact buffered form of a tweet whose fields are already converted.
+
+    Buffers hold records instead of Items: a record is a single object with
+    fixed slots, and its low-cardinality fields share interned strings.
+    `to_item` builds the Item, which scrapes only do for the records they
+    hand out, so records left in the buffer when a query ends never pay for
+    the Item and its field wrappers. `utc_created_at` is only set when the
+    tweet's offset made it differ from `created_at`.
+    """
+
+    __slots__ = ("content", "author", "created_at", "domain", "url", "external_id", "external_parent_id", "utc_created_at")
+
+    def __init__(
+        self,
+        content: str,
+        author: str,
+        created_at: str,
+        domain: str,
+        url: str,
+        external_id: str,
+        external_parent_id: Optional[str] = None,
+        utc_created_at: Optional[str] = None,
+    ):
+        self.content = content
+        self.author = author
+        self.created_at = created_at
+        self.domain = sys.intern(domain)
+        self.url = url
+        self.external_id = external_id
+        self.external_parent_id = external_parent_id
+        self.utc_created_at = utc_created_at
+
+    def __repr__(self) -> str:
+        return f"TweetRecord(external_id={self.external_id!r}, created_at={self.created_at!r})"
+
+    def __reduce__(self):
+        # Slots without a __dict__, sent back from process workers as plain tuples
+        return TweetRecord, (
+            self.content, self.author, self.created_at, self.domain, self.url, self.external_id, self.external_parent_id, self.utc_created_at,
+        )
+
+    def to_item(self) -> Item:
+        """Build the Item of this record."""
+        return Item(
+            content=Content(self.content),
+            author=Author(self.author),
+            created_at=CreatedAt(self.created_at),
+            domain=Domain(self.domain),
+            url=Url(self.url),
+            external_id=ExternalId(self.external_id),
+            external_parent_id=ExternalParentId(self.external_parent_id) if self.external_parent_id else None
+        )
@@ -0,0 +1,33 @@
+from typing import Callable, Dict, Generic, Hashable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class Registry(Generic[T]):
+    """Process-wide instances shared by the queries asking for the same key.
+
+    Sharing keeps state such as caches, windows, health statistics and
+    connections alive across queries. A key holds the whole configuration an
+    instance is created with, so queries with other settings get their own
+    instance instead of reconfiguring one that other queries are using.
+    """
+
+    def __init__(self):
+        self._instances: Dict[Hashable, T] = {}
+
+    def get(self, key: Hashable, create: Callable[[], T]) -> T:
+        """Return the instance stored under `key`, calling `create` to make it on first use."""
+        instance = self._instances.get(key)
+        if instance is None:
+            instance = self._instances[key] = create()
+        return instance
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(list(self._instances.values()))
+
+    def __len__(self) -> int:
+        return len(self._instances)
+
+    def clear(self):
+        """Forget every instance, e.g. to start over as a restarted worker would."""
+        self._instances.clear()
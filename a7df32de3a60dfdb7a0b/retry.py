@@ -0,0 +1,139 @@
+import random
+import time
+from typing import Optional
+import httpx
+
+# Retry configuration
+DEFAULT_BASE_DELAY_SECONDS = 0.5  # Delay before the first retry
+DEFAULT_MAX_DELAY_SECONDS = 30.0  # Upper bound of a single backoff delay
+DEFAULT_BACKOFF_MULTIPLIER = 2.0
+DEFAULT_MAX_RETRIES = 20  # Retries allowed per query, None for no limit
+DEFAULT_RETRY_DEADLINE_SECONDS = None  # Time after which a query stops retrying
+RETRY_STATUS_CODES = {404, 429, 500, 502, 503, 504}
+
+# Circuit breaker configuration
+DEFAULT_FAILURE_THRESHOLD = 10  # Consecutive failures before the circuit opens
+DEFAULT_RESET_TIMEOUT_SECONDS = 30.0  # Time the circuit stays open before a trial request
+
+
+class RetryError(Exception):
+    """Base class for errors raised when a request is no longer retried."""
+
+
+class RetryBudgetExhausted(RetryError):
+    """The retry budget or deadline of a query has been used up."""
+
+
+class CircuitOpenError(RetryError):
+    """The upstream is considered down and requests fail fast."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a request that failed with `error` is worth retrying."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUS_CODES
+    # Connect, read, write and pool timeouts as well as dropped connections
+    return isinstance(error, httpx.TransportError)
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, bounded by a retry budget and a deadline.
+
+    One policy is created per query, so `max_retries` and `deadline` limit the
+    retries of the whole query rather than of a single request.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = DEFAULT_BASE_DELAY_SECONDS,
+        max_delay: float = DEFAULT_MAX_DELAY_SECONDS,
+        multiplier: float = DEFAULT_BACKOFF_MULTIPLIER,
+        max_retries: Optional[int] = DEFAULT_MAX_RETRIES,
+        deadline: Optional[float] = DEFAULT_RETRY_DEADLINE_SECONDS,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.max_retries = max_retries
+        self.deadline = None if deadline is None else time.monotonic() + deadline
+        self.retries = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (0-based), with equal jitter."""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def next_delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Spend one retry and return the delay to wait before it.
+
+        Raises RetryBudgetExhausted when the budget is spent or the retry would
+        start after the deadline.
+        """
+        if self.max_retries is not None and self.retries >= self.max_retries:
+            raise RetryBudgetExhausted(f"Gave up after {self.retries} retries.") from error
+        delay = self.backoff(attempt)
+        if self.deadline is not None and time.monotonic() + delay > self.deadline:
+            raise RetryBudgetExhausted("Retry deadline exceeded.") from error
+        self.retries += 1
+        return delay
+
+
+class CircuitBreaker:
+    """Fail fast while the upstream keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    `check` raises CircuitOpenError. Once `reset_timeout` has passed a single
+    trial request is let through; success closes the circuit, failure opens it
+    again. A trial that ends without either, because it was cancelled or
+    failed in a way that says nothing about the upstream, must be handed back
+    with `release_trial` so the next request can try instead. A throttled
+    request (429) is neither a success nor a failure: it counts towards
+    nothing and hands a trial back.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def check(self) -> bool:
+        """Raise CircuitOpenError unless a request may be sent now; True when it is the half-open trial."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half-open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        raise CircuitOpenError(f"Circuit open after {self.failures} consecutive failures.")
+
+    def release_trial(self):
+        """Let another trial through after one that ended without a success or failure."""
+        self.trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_throttled(self):
+        self.release_trial()
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
@@ -0,0 +1,113 @@
+import json
+import logging
+from contextlib import contextmanager
+from typing import Iterable, List, Union
+from exorde_data import Item
+from .records import TweetRecord
+from .registry import Registry
+
+logger = logging.getLogger(__name__)
+
+# Spool configuration
+DEFAULT_SPOOL_MAX_ITEMS = 10_000  # Oldest items are evicted beyond this
+
+
+def item_to_record(item: Union[Item, TweetRecord]) -> str:
+    """Serialize an Item or TweetRecord into a compact JSON array."""
+    fields = [item.content, item.author, item.created_at, item.domain, item.url, item.external_id]
+    parent_id = getattr(item, "external_parent_id", None)
+    utc_created_at = getattr(item, "utc_created_at", None)
+    if parent_id or utc_created_at:
+        fields.append(parent_id)
+    if utc_created_at:
+        fields.append(utc_created_at)
+    return json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+
+
+def record_to_tweet_record(record: str) -> TweetRecord:
+    """Rebuild the TweetRecord of an item serialized by `item_to_record`."""
+    return TweetRecord(*json.loads(record))
+
+
+def record_to_item(record: str) -> Item:
+    """Rebuild an Item serialized by `item_to_record`."""
+    return record_to_tweet_record(record).to_item()
+
+
+class Spool:
+    """SQLite-backed FIFO of fetched items that were never consumed.
+
+    Items left in a query's buffer when it ends are appended here, and the
+    next query drains them before it hits the network, so a restarted worker
+    serves its first items straight from disk. Beyond `max_items` the oldest
+    entries are evicted.
+    """
+
+    def __init__(self, path: str, max_items: int = DEFAULT_SPOOL_MAX_ITEMS):
+        import sqlite3  # Only loaded when spooling is enabled
+
+        self.path = path
+        self.max_items = max_items
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS spool (id INTEGER PRIMARY KEY AUTOINCREMENT, record TEXT NOT NULL)")
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def push(self, items: Iterable[Union[Item, TweetRecord]]) -> int:
+        """Append items, evict the oldest beyond the cap and return how many were stored."""
+        records = [(item_to_record(item),) for item in items]
+        if not records:
+            return 0
+        with self._transaction():
+            self._connection.executemany("INSERT INTO spool (record) VALUES (?)", records)
+            self._connection.execute(
+                "DELETE FROM spool WHERE id NOT IN (SELECT id FROM spool ORDER BY id DESC LIMIT ?)",
+                (self.max_items,),
+            )
+        return len(records)
+
+    def pop(self, count: int) -> List[TweetRecord]:
+        """Remove and return up to `count` of the oldest items, as records ready to buffer."""
+        if count <= 0:
+            return []
+        with self._transaction():
+            rows = self._connection.execute("SELECT id, record FROM spool ORDER BY id LIMIT ?", (count,)).fetchall()
+            if rows:
+                self._connection.execute("DELETE FROM spool WHERE id <= ?", (rows[-1][0],))
+        items = []
+        for _, record in rows:
+            try:
+                items.append(record_to_tweet_record(record))
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Dropping unreadable spool record: {e}")
+        return items
+
+    @contextmanager
+    def _transaction(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def close(self):
+        self._connection.close()
+
+
+# One connection per file
+_spools: "Registry[Spool]" = Registry()
+
+
+def get_spool(path: str, max_items: int = DEFAULT_SPOOL_MAX_ITEMS) -> Spool:
+    """Return the process-wide spool stored at `path`.
+
+    Raises ValueError when it is already open with another `max_items`.
+    """
+    spool = _spools.get(path, lambda: Spool(path, max_items))
+    if spool.max_items != max_items:
+        raise ValueError(f"Spool '{path}' is already open with max_items={spool.max_items}, not {max_items}.")
+    return spool
@@ -0,0 +1,176 @@
+import codecs
+import json
+import re
+from typing import AsyncIterator, Dict, Iterator, List, Union
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq")
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+STREAM_ACCEPT = "application/x-ndjson, application/json;q=0.9"
+
+_TWEETS_ARRAY_START = re.compile(r'"tweets"\s*:\s*\[')
+_SEPARATORS = " \t\r\n,"
+_decoder = json.JSONDecoder()
+
+
+class JSONArrayParser:
+    """Incrementally parse the objects of a JSON array out of text chunks.
+
+    Accepts either a bare array or an object whose "tweets" member is the
+    array, and returns each element as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Add a chunk of text and return the elements it completed."""
+        self._text = self._text[self._pos:] + chunk
+        self._pos = 0
+        items = []
+        if not self._in_array:
+            stripped = self._text.lstrip()
+            if not stripped:
+                return items
+            if stripped[0] == "[":
+                self._pos = len(self._text) - len(stripped) + 1
+            else:
+                match = _TWEETS_ARRAY_START.search(self._text)
+                if match is None:
+                    return items
+                self._pos = match.end()
+            self._in_array = True
+        while not self.done:
+            while self._pos < len(self._text) and self._text[self._pos] in _SEPARATORS:
+                self._pos += 1
+            if self._pos >= len(self._text):
+                break
+            if self._text[self._pos] == "]":
+                self.done = True
+                break
+            try:
+                item, end = _decoder.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError:
+                break  # Element not complete yet
+            items.append(item)
+            self._pos = end
+        return items
+
+    def close(self) -> List[Dict]:
+        """Check that the array was complete."""
+        if not self.done:
+            raise ValueError("Truncated JSON response: the tweets array was not closed.")
+        return []
+
+
+class NDJSONParser:
+    """Incrementally parse newline delimited JSON objects out of text chunks."""
+
+    def __init__(self):
+        self._partial = ""
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Add a chunk of text and return the complete lines it finished."""
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def close(self) -> List[Dict]:
+        """Parse a last line that was not newline terminated."""
+        partial, self._partial = self._partial, ""
+        if not partial.strip():
+            return []
+        try:
+            return [json.loads(partial)]
+        except json.JSONDecodeError as e:
+            raise ValueError("Truncated NDJSON response: the last line is incomplete.") from e
+
+
+class MessagePackParser:
+    """Incrementally unpack MessagePack tweets out of byte chunks.
+
+    The body is either one array or map of tweets, like the JSON response, or
+    a sequence of tweet maps; each tweet is returned once it is complete, but
+    a single top-level array or map only once it has fully arrived.
+    """
+
+    binary = True
+
+    def __init__(self):
+        import msgpack  # Only loaded when the upstream answers in MessagePack
+
+        self._unpacker = msgpack.Unpacker(raw=False)
+        self._fed = 0
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        """Add a chunk of bytes and return the tweets it completed."""
+        self._unpacker.feed(chunk)
+        self._fed += len(chunk)
+        items = []
+        for value in self._unpacker:
+            if isinstance(value, list):
+                items.extend(value)
+            elif "tweets" in value:
+                items.extend(value["tweets"])
+            else:
+                items.append(value)
+        return items
+
+    def close(self) -> List[Dict]:
+        """Check that no value was left incomplete."""
+        if self._unpacker.tell() != self._fed:
+            raise ValueError("Truncated MessagePack response.")
+        return []
+
+
+def parser_for(content_type: str):
+    """Return a fresh parser for the response content type."""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in NDJSON_CONTENT_TYPES:
+        return NDJSONParser()
+    if media_type in MSGPACK_CONTENT_TYPES:
+        return MessagePackParser()
+    return JSONArrayParser()
+
+
+def decode_tweets(body: Union[str, bytes], content_type: str = "application/json", encoding: str = "utf-8") -> List[Dict]:
+    """Decode a complete response body into its list of tweets."""
+    parser = parser_for(content_type)
+    if getattr(parser, "binary", False):
+        return parser.feed(body) + parser.close()
+    if isinstance(body, bytes):
+        body = body.decode(encoding, errors="replace")
+    if isinstance(parser, NDJSONParser):
+        return parser.feed(body) + parser.close()
+    body = json.loads(body)
+    if isinstance(body, list):
+        return body
+    return body.get("tweets", [])
+
+
+def parse_chunks(chunks: Iterator[str], content_type: str = "application/json") -> Iterator[Dict]:
+    """Parse complete text chunks synchronously, mostly useful for testing."""
+    parser = parser_for(content_type)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+async def iter_stream(byte_chunks: AsyncIterator[bytes], content_type: str, encoding: str = "utf-8") -> AsyncIterator[Dict]:
+    """Yield the tweet objects of a streamed response as they complete."""
+    parser = parser_for(content_type)
+    if getattr(parser, "binary", False):
+        async for chunk in byte_chunks:
+            for item in parser.feed(chunk):
+                yield item
+        for item in parser.close():
+            yield item
+        return
+    text_decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    async for chunk in byte_chunks:
+        for item in parser.feed(text_decoder.decode(chunk)):
+            yield item
+    for item in parser.feed(text_decoder.decode(b"", final=True)) + parser.close():
+        yield item
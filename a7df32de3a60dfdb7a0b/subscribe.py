@@ -0,0 +1,222 @@
+import asyncio
+import json
+import logging
+from typing import AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+import httpx
+from .retry import RetryPolicy, is_retryable
+from .metrics import ITEMS_FETCHED, SUBSCRIPTION_RECONNECTS
+from .registry import Registry
+
+logger = logging.getLogger(__name__)
+
+# Push subscription configuration
+SSE_ACCEPT = "text/event-stream"
+DEFAULT_RECONNECT_DELAY_SECONDS = 0.5  # Until the server sends its own `retry:` hint
+DEFAULT_SUBSCRIBE_READ_TIMEOUT_SECONDS = 30.0  # Silence after which the connection is considered dead
+TWEET_EVENTS = ("message", "tweet")
+
+
+class ServerSentEvent:
+    """One event of a text/event-stream response."""
+
+    __slots__ = ("event", "data", "id", "retry")
+
+    def __init__(self, event: str = "message", data: str = "", id: Optional[str] = None, retry: Optional[int] = None):
+        self.event = event
+        self.data = data
+        self.id = id
+        self.retry = retry
+
+
+class SSEParser:
+    """Incrementally parse Server-Sent Events out of text chunks."""
+
+    def __init__(self):
+        self._partial = ""
+        self._reset()
+
+    def _reset(self):
+        self._event = "message"
+        self._data: List[str] = []
+        self._id: Optional[str] = None
+        self._retry: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[ServerSentEvent]:
+        """Add a chunk of text and return the events it completed."""
+        lines = (self._partial + chunk).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        self._partial = lines.pop()
+        events = []
+        for line in lines:
+            if not line:
+                # A blank line dispatches the event, comments and retry-only blocks carry no data
+                if self._data or self._id is not None or self._retry is not None:
+                    events.append(ServerSentEvent(self._event, "\n".join(self._data), self._id, self._retry))
+                self._reset()
+                continue
+            if line.startswith(":"):
+                continue  # Comment, used as heartbeat
+            field, _, value = line.partition(":")
+            if value.startswith(" "):
+                value = value[1:]
+            if field == "data":
+                self._data.append(value)
+            elif field == "event":
+                self._event = value
+            elif field == "id":
+                self._id = value
+            elif field == "retry" and value.isdigit():
+                self._retry = int(value)
+        return events
+
+
+class Subscription:
+    """Long-lived push subscription to a text/event-stream of tweets.
+
+    Each event carries one tweet (or a JSON array of tweets) as its data. When
+    the connection drops it is reopened with `Last-Event-ID`, so the server
+    can resume right after the last event that was handed on in full; the
+    tweets of a partly handed on event are skipped when it arrives again,
+    so a query stopping mid-event does not repeat them. Subscriptions
+    are shared per URL, so the next query resumes where the previous one
+    stopped. Reconnects after a connection that delivered tweets wait the
+    server's `retry:` hint; consecutive failed attempts back off and spend
+    the retry budget of the query.
+    """
+
+    def __init__(self, url: str, last_event_id: Optional[str] = None):
+        self.url = url
+        self.last_event_id = last_event_id
+        self.partial_event_id: Optional[str] = None  # Event following `last_event_id` that was handed on in part
+        self.partial_handed_on = 0  # Tweets of that event already handed on
+        self.reconnect_delay = DEFAULT_RECONNECT_DELAY_SECONDS
+        self.connections = 0
+
+    async def tweets(
+        self,
+        client: httpx.AsyncClient,
+        retry: Optional[RetryPolicy] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncGenerator[Dict, None]:
+        """Yield pushed tweets as they arrive, reconnecting until `limit` tweets were yielded, cancelled or out of retries."""
+        if retry is None:
+            retry = RetryPolicy()
+        request_options = {} if timeout is None else {"timeout": timeout}
+        attempt = 0
+        yielded = 0
+        while True:
+            headers = {"Accept": SSE_ACCEPT, "Cache-Control": "no-cache"}
+            if self.last_event_id is not None:
+                headers["Last-Event-ID"] = self.last_event_id
+            last_error = None
+            try:
+                self.connections += 1
+                async with client.stream("GET", self.url, headers=headers, **request_options) as response:
+                    response.raise_for_status()
+                    parser = SSEParser()
+                    async for text in response.aiter_text():
+                        for event in parser.feed(text):
+                            if event.retry is not None:
+                                self.reconnect_delay = event.retry / 1000
+                            if event.event not in TWEET_EVENTS or not event.data:
+                                continue
+                            attempt = 0
+                            try:
+                                payload = json.loads(event.data)
+                            except json.JSONDecodeError:
+                                logger.warning(f"Skipping malformed event {event.id} on subscription to '{self.url}'.")
+                                continue
+                            tweets = payload if isinstance(payload, list) else [payload]
+                            start = self.partial_handed_on if event.id is not None and event.id == self.partial_event_id else 0
+                            ITEMS_FETCHED.inc(len(tweets) - start)
+                            for index in range(start, len(tweets)):
+                                # Counted before handing it on, the consumer may stop at this tweet
+                                self.partial_event_id, self.partial_handed_on = event.id, index + 1
+                                yield tweets[index]
+                                yielded += 1
+                                if limit is not None and yielded >= limit and index + 1 < len(tweets):
+                                    return  # Resume with this event, part of it was not handed on
+                            # Only events that were handed on in full count as received when resuming
+                            if event.id is not None:
+                                self.last_event_id = event.id
+                            self.partial_event_id, self.partial_handed_on = None, 0
+                            if limit is not None and yielded >= limit:
+                                return
+                error = f"Subscription to '{self.url}' closed by the server."
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                error = f"{type(e).__name__} on subscription to '{self.url}'."
+
+            SUBSCRIPTION_RECONNECTS.inc()
+            if attempt == 0:
+                delay = self.reconnect_delay
+            else:
+                delay = max(self.reconnect_delay, retry.next_delay(attempt - 1, last_error))
+            attempt += 1
+            logger.warning(f"{error} Reconnecting in {delay:.2f} seconds from event {self.last_event_id}.")
+            await asyncio.sleep(delay)
+
+
+class Subscriber:
+    """Prefetcher counterpart for push transports.
+
+    Keeps one task running `pump`, which feeds the buffer from a subscription
+    with up to the given number of tweets, and offers the `refill`/`wait`/
+    `close` interface of Prefetcher so the scrape loop is the same for both
+    transports. `buffered` returns the number of items currently buffered.
+    Backpressure comes from the buffer: while it is full the pump stops
+    reading from the connection.
+    """
+
+    def __init__(self, pump: Callable[[int], Awaitable], buffered: Callable[[], int]):
+        self.pump = pump
+        self.buffered = buffered
+        self.task: Optional[asyncio.Task] = None
+
+    def refill(self, remaining: int):
+        """Start the subscription for the tweets still needed unless it is running."""
+        needed = remaining - self.buffered()
+        if self.task is None and needed > 0:
+            self.task = asyncio.create_task(self.pump(needed))
+
+    async def wait(self, ready: Optional[Awaitable] = None, timeout: Optional[float] = None):
+        """Wait for `ready`, at most `timeout` seconds, re-raising a failure of the subscription."""
+        waiters = set()
+        if self.task is not None:
+            waiters.add(self.task)
+        ready_task = None
+        if ready is not None:
+            ready_task = asyncio.ensure_future(ready)
+            waiters.add(ready_task)
+        if not waiters:
+            return
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if ready_task is not None and not ready_task.done():
+                ready_task.cancel()
+        if self.task is not None and self.task.done():
+            task, self.task = self.task, None
+            task.result()
+
+    async def close(self):
+        """Stop the subscription."""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+_subscriptions: "Registry[Subscription]" = Registry()
+
+
+def get_subscription(url: str) -> Subscription:
+    """Return the process-wide subscription to `url`."""
+    return _subscriptions.get(url, lambda: Subscription(url))
+
+
+def subscribe_timeout(timeout: httpx.Timeout, read_timeout: Optional[float] = DEFAULT_SUBSCRIBE_READ_TIMEOUT_SECONDS) -> httpx.Timeout:
+    """Request timeouts of a subscription: the usual ones, but a longer read timeout for idle streams."""
+    return httpx.Timeout(connect=timeout.connect, read=read_timeout, write=timeout.write, pool=timeout.pool)
@@ -0,0 +1,288 @@
+import asyncio
+from functools import partial
+from typing import TYPE_CHECKING, AsyncGenerator, Dict, List, Optional, Set, Tuple, Union
+from exorde_data import Item
+from .authors import AuthorHasher, get_author_hasher
+from .dates import CONVERTED_KEY, format_created_at_batch
+from .records import TweetRecord
+from .dedup import SeenIds, BloomFilter, save_in_background
+from .filters import TweetFilter
+from .cursor import Cursor
+from .neardup import NearDuplicateIndex, NEAR_DUP_ACTIONS
+from .metrics import ITEMS_SKIPPED, ITEMS_DUPLICATE, ITEMS_FILTERED, ITEMS_NEAR_DUPLICATE, ITEMS_STALE
+from .registry import Registry
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+# Transform configuration
+DEFAULT_TRANSFORM_EXECUTOR = None  # "thread" or "process" to build Items off the event loop
+DEFAULT_TRANSFORM_WORKERS = None  # Worker count, None for the executor's default
+DEFAULT_TRANSFORM_CHUNK_SIZE = 100  # Tweets handed to a worker at once
+DEFAULT_NEAR_DUP_ACTION = "drop"  # Or "tag" to keep near duplicates with the id of the item they repeat as parent
+
+
+# Function to build the buffered record of a raw tweet
+def build_record(tweet: Dict, content: str, created_at: str, author_hasher: AuthorHasher) -> TweetRecord:
+    """Build the record of a tweet whose content and created_at are already converted."""
+    converted = tweet.get(CONVERTED_KEY)
+    return TweetRecord(
+        content,
+        author_hasher(tweet.get("author_", "[deleted]")),
+        created_at,
+        tweet.get("domain_", "x.com"),
+        tweet.get("url_", ""),
+        tweet.get("external_id_", ""),
+        tweet.get("external_parent_id_"),
+        converted[1] if converted is not None and converted[1] != created_at else None,
+    )
+
+
+# Function to build an Item from a raw tweet
+def build_item(tweet: Dict, content: str, created_at: str, author_hasher: AuthorHasher) -> Item:
+    """Build an Item from a tweet whose content and created_at are already converted."""
+    return build_record(tweet, content, created_at, author_hasher).to_item()
+
+
+# Function to check whether a raw tweet should become an Item
+def accept_tweet(
+    tweet: Dict,
+    dedup: Optional[Union[SeenIds, BloomFilter]] = None,
+    tweet_filter: Optional[TweetFilter] = None,
+    near_duplicates: Optional[NearDuplicateIndex] = None,
+    near_duplicate_action: str = DEFAULT_NEAR_DUP_ACTION,
+    cursor: Optional[Cursor] = None,
+) -> Optional[str]:
+    """Return the stripped content of a tweet worth keeping, or None to skip it.
+
+    Tweets whose id is in `dedup` are rejected; recording the ids is left to
+    the caller, which does so once the items were yielded. Filtered out
+    tweets and tweets behind the `cursor` are rejected before that, and only
+    new tweets are compared with recent content. Near duplicates are
+    dropped, or with the "tag" action kept with the external id of the
+    tweet they repeat as their external parent id.
+    """
+    content = tweet.get("content_", "").strip()
+    if not content:
+        ITEMS_SKIPPED.inc()
+        return None
+    if tweet_filter is not None and not tweet_filter.accept(tweet, content):
+        ITEMS_FILTERED.inc()
+        return None
+    if cursor is not None and not cursor.is_new(tweet):
+        ITEMS_STALE.inc()
+        return None
+    if dedup is not None and tweet.get("external_id_") and tweet["external_id_"] in dedup:
+        ITEMS_DUPLICATE.inc()
+        return None
+    if near_duplicates is not None:
+        original = near_duplicates.check(content, tweet.get("external_id_", ""))
+        if original is not None and not _keep_near_duplicate(tweet, original, near_duplicate_action):
+            return None
+    return content
+
+
+def _keep_near_duplicate(tweet: Dict, original: str, near_duplicate_action: str) -> bool:
+    """Whether to keep a near duplicate of the tweet with id `original`, which the "tag" action sets as its parent."""
+    ITEMS_NEAR_DUPLICATE.inc()
+    if near_duplicate_action == "drop":
+        return False
+    if original:
+        tweet.setdefault("external_parent_id_", original)
+    return True
+
+
+# Function to turn accepted tweets into buffered records
+def transform_tweets(pairs: List[Tuple[Dict, str]], author_hasher: AuthorHasher) -> List[TweetRecord]:
+    """Build the records of (tweet, content) pairs, converting the timestamps not converted while accepting them in one call."""
+    converted = iter(format_created_at_batch([tweet.get("created_at_", "") for tweet, _ in pairs if CONVERTED_KEY not in tweet]))
+    return [
+        build_record(tweet, content, tweet[CONVERTED_KEY][0] if CONVERTED_KEY in tweet else next(converted), author_hasher)
+        for tweet, content in pairs
+    ]
+
+
+def _transform_in_worker(pairs: List[Tuple[Dict, str]], algorithm: str, cache_size: int, digest_size: int) -> List[TweetRecord]:
+    # Runs in a worker process, which keeps its own author cache
+    return transform_tweets(pairs, get_author_hasher(algorithm, cache_size, digest_size))
+
+
+_executors: "Registry[Executor]" = Registry()
+
+
+def get_executor(kind: str, workers: Optional[int] = DEFAULT_TRANSFORM_WORKERS) -> "Executor":
+    """Return the process-wide "thread" or "process" executor with `workers` workers."""
+    # The executor machinery is only imported by queries that use it
+    if kind == "thread":
+        from concurrent.futures import ThreadPoolExecutor
+        return _executors.get((kind, workers), lambda: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tweet-transform"))
+    if kind == "process":
+        from concurrent.futures import ProcessPoolExecutor
+        return _executors.get((kind, workers), lambda: ProcessPoolExecutor(max_workers=workers))
+    raise ValueError(f"Unknown transform executor '{kind}', expected 'thread' or 'process'.")
+
+
+def shutdown_executors():
+    """Shut down the transform executors, e.g. before the process exits."""
+    for executor in _executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
+
+
+class TweetTransformer:
+    """Turn raw tweets into buffered records of Items.
+
+    `accept` filters raw tweets on the event loop, with the query's
+    `tweet_filter`, `cursor`, deduplication and `near_duplicates` index, so
+    rejected tweets never reach `transform`, which converts the fields and
+    builds the records that stand in for Items while buffered. Ids and
+    content only enter the `dedup` window and `near_duplicates` index once
+    `yielded` reports their item as handed out; until then the transformer
+    rejects repeats of them itself, so tweets that were buffered but never
+    delivered are accepted again later. With an
+    `executor` ("thread" or "process"), batches are split into chunks of
+    `chunk_size` tweets that run on the executor's workers, and the chunks
+    are returned in order as they finish so the event loop stays responsive
+    while the CPU work runs, on several cores with processes.
+    """
+
+    def __init__(
+        self,
+        author_hasher: Optional[AuthorHasher] = None,
+        dedup: Optional[Union[SeenIds, BloomFilter]] = None,
+        executor: Optional[str] = DEFAULT_TRANSFORM_EXECUTOR,
+        workers: Optional[int] = DEFAULT_TRANSFORM_WORKERS,
+        chunk_size: int = DEFAULT_TRANSFORM_CHUNK_SIZE,
+        tweet_filter: Optional[TweetFilter] = None,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        near_duplicate_action: str = DEFAULT_NEAR_DUP_ACTION,
+        cursor: Optional[Cursor] = None,
+    ):
+        if near_duplicate_action not in NEAR_DUP_ACTIONS:
+            raise ValueError(f"Unknown near-duplicate action '{near_duplicate_action}', expected 'drop' or 'tag'.")
+        self.author_hasher = author_hasher if author_hasher is not None else get_author_hasher()
+        self.dedup = dedup
+        self.executor_kind = executor
+        self.executor = get_executor(executor, workers) if executor is not None else None
+        self.chunk_size = max(1, chunk_size)
+        self.tweet_filter = tweet_filter
+        self.near_duplicates = near_duplicates
+        self.near_duplicate_action = near_duplicate_action
+        self.cursor = cursor
+        self._pending: Set[str] = set()  # Ids of accepted tweets whose items were not yielded yet
+        self._pending_near_duplicates = None  # Fingerprints of the accepted tweets with ids whose items were not yielded yet
+        if near_duplicates is not None:
+            self._pending_near_duplicates = NearDuplicateIndex(
+                near_duplicates.threshold, near_duplicates.capacity, None, near_duplicates.minhash.num_perm
+            )
+
+    @property
+    def filtering(self) -> bool:
+        """Whether tweets with content may be rejected, so batches can come back short or empty."""
+        return any(option is not None for option in (self.dedup, self.tweet_filter, self.near_duplicates, self.cursor))
+
+    def accept(self, tweet: Dict) -> Optional[str]:
+        """Return the content of a tweet worth keeping, or None to skip it."""
+        external_id = tweet.get("external_id_")
+        if self.dedup is not None and external_id and external_id in self._pending:
+            ITEMS_DUPLICATE.inc()
+            return None
+        # Content of tweets without an id cannot be held until yielded, it is indexed right away
+        near_duplicates = None if external_id else self.near_duplicates
+        content = accept_tweet(tweet, self.dedup, self.tweet_filter, near_duplicates, self.near_duplicate_action, self.cursor)
+        if content is not None and external_id and self.near_duplicates is not None:
+            content = self._check_near_duplicate(tweet, content, external_id)
+        if content is not None and self.dedup is not None and external_id:
+            self._pending.add(external_id)
+        return content
+
+    def _check_near_duplicate(self, tweet: Dict, content: str, external_id: str) -> Optional[str]:
+        signature = self.near_duplicates.fingerprint(content)
+        if signature is None:
+            return content
+        original = self.near_duplicates.find(signature, external_id)
+        if original is None:
+            original = self._pending_near_duplicates.find(signature, external_id)
+        if original is None:
+            self._pending_near_duplicates.add(signature, external_id)
+            return content
+        return content if _keep_near_duplicate(tweet, original, self.near_duplicate_action) else None
+
+    def restore(self, records: List[TweetRecord]) -> List[TweetRecord]:
+        """Return the spooled records still worth handing out, holding their ids and content like those of accepted tweets."""
+        if self.dedup is None and self.near_duplicates is None:
+            return records
+        kept = []
+        for record in records:
+            external_id = record.external_id
+            if external_id and self.dedup is not None:
+                if external_id in self._pending or external_id in self.dedup:
+                    ITEMS_DUPLICATE.inc()
+                    continue
+                self._pending.add(external_id)
+            if external_id and self.near_duplicates is not None:
+                signature = self.near_duplicates.fingerprint(record.content)
+                if signature is not None:
+                    self._pending_near_duplicates.add(signature, external_id)
+            kept.append(record)
+        return kept
+
+    def upstream_fields(self) -> Dict:
+        """Filter and cursor fields to send along with /get_tweets requests."""
+        fields = self.tweet_filter.upstream_fields() if self.tweet_filter is not None else {}
+        if self.cursor is not None:
+            position = self.cursor.upstream_fields()
+            if position:
+                # The later of the filter's `since` and the cursor's mark applies
+                fields["since"] = max(fields.get("since", ""), position["since"])
+                fields["cursor"] = position["cursor"]
+        return fields
+
+    def yielded(self, item: Union[Item, TweetRecord]):
+        """Record that `item` (its record, so the cursor sees the UTC time) was handed out.
+
+        Its id joins the dedup window, its content the near-duplicate index
+        and the cursor moves past it.
+        """
+        if self.dedup is not None and item.external_id:
+            self.dedup.add(item.external_id)
+            self._pending.discard(item.external_id)
+        if self.near_duplicates is not None and item.external_id:
+            signature = self._pending_near_duplicates.pop(item.external_id)
+            if signature is not None:
+                self.near_duplicates.add(signature, item.external_id)
+        if self.cursor is not None:
+            self.cursor.advance(getattr(item, "utc_created_at", None) or item.created_at, item.external_id)
+
+    def _chunk_function(self):
+        if self.executor_kind == "process":
+            hasher = self.author_hasher
+            return partial(_transform_in_worker, algorithm=hasher.algorithm, cache_size=hasher.cache_size, digest_size=hasher.digest_size)
+        return partial(transform_tweets, author_hasher=self.author_hasher)
+
+    async def transform(self, pairs: List[Tuple[Dict, str]]) -> AsyncGenerator[List[TweetRecord], None]:
+        """Yield the records of accepted (tweet, content) pairs, chunk by chunk."""
+        if not pairs:
+            return
+        if self.executor is None:
+            yield transform_tweets(pairs, self.author_hasher)
+            return
+        loop = asyncio.get_running_loop()
+        function = self._chunk_function()
+        futures = [
+            loop.run_in_executor(self.executor, function, pairs[i:i + self.chunk_size])
+            for i in range(0, len(pairs), self.chunk_size)
+        ]
+        try:
+            for future in futures:
+                yield await future
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def save(self):
+        """Persist state that should survive a restart, writing the dedup window off the event loop."""
+        if self.cursor is not None:
+            self.cursor.save()
+        if self.dedup is not None:
+            await save_in_background(self.dedup)
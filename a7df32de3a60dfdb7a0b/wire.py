@@ -0,0 +1,87 @@
+import logging
+from typing import Dict, Optional, Sequence, Union
+from .stream import STREAM_ACCEPT
+
+logger = logging.getLogger(__name__)
+
+# Wire format configuration
+DEFAULT_WIRE_FORMAT = "json"  # "msgpack" to ask for MessagePack bodies, JSON stays the fallback
+DEFAULT_COMPRESSION = None  # Content codings to accept, None for every one httpx can decode
+JSON_ACCEPT = "application/json"
+MSGPACK_ACCEPT = "application/msgpack, application/json;q=0.9"
+MSGPACK_STREAM_ACCEPT = "application/msgpack, application/x-ndjson;q=0.9, application/json;q=0.8"
+WIRE_FORMATS = ("json", "msgpack")
+
+
+def msgpack_available() -> bool:
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def brotli_available() -> bool:
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return False
+    return True
+
+
+def zstandard_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def supported_encodings() -> Sequence[str]:
+    """Content codings httpx can decode here; br and zstd need the brotli and zstandard packages."""
+    encodings = ["gzip", "deflate"]
+    if brotli_available():
+        encodings.append("br")
+    if zstandard_available():
+        encodings.append("zstd")
+    return encodings
+
+
+def accept_encoding(compression: Union[str, Sequence[str], None] = DEFAULT_COMPRESSION) -> Optional[str]:
+    """Accept-Encoding value for `compression`, in order of preference; None keeps the httpx default."""
+    if compression is None:
+        return None
+    if isinstance(compression, str):
+        compression = [encoding.strip() for encoding in compression.split(",")]
+    supported = supported_encodings()
+    accepted = []
+    for encoding in compression:
+        if encoding == "identity" or encoding in supported:
+            accepted.append(encoding)
+        else:
+            logger.warning(f"Compression '{encoding}' requested but cannot be decoded here, not offering it.")
+    return ", ".join(accepted) or "identity"
+
+
+def request_headers(
+    stream: bool = False,
+    wire_format: str = DEFAULT_WIRE_FORMAT,
+    compression: Union[str, Sequence[str], None] = DEFAULT_COMPRESSION,
+) -> Dict[str, str]:
+    """Headers negotiating the response format and compression of /get_tweets requests."""
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Unknown wire format '{wire_format}', expected one of {', '.join(WIRE_FORMATS)}.")
+    accept = STREAM_ACCEPT if stream else JSON_ACCEPT
+    if wire_format == "msgpack":
+        if msgpack_available():
+            accept = MSGPACK_STREAM_ACCEPT if stream else MSGPACK_ACCEPT
+        else:
+            logger.warning("MessagePack requested but the 'msgpack' package is not installed. Falling back to JSON.")
+    headers = {"Accept": accept}
+    encodings = accept_encoding(compression)
+    if encodings is not None:
+        headers["Accept-Encoding"] = encodings
+    return headers
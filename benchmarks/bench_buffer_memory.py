@@ -0,0 +1,88 @@
+"""Memory and build time of buffered tweets: eagerly built Items against compact records.
+
+Synthetic tweets from the stand-in server are turned into a full buffer
+either of Items (how buffers were filled before) or of TweetRecords, of
+which only the share handed out is later turned into Items. Run with the
+package installed (pip install -e .), with the real exorde_data so Items
+have their actual size:
+
+    python benchmarks/bench_buffer_memory.py
+    python benchmarks/bench_buffer_memory.py --items 100000 --yielded 0.1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from a7df32de3a60dfdb7a0b.authors import get_author_hasher
+from a7df32de3a60dfdb7a0b.buffer import ItemBuffer
+from a7df32de3a60dfdb7a0b.dates import format_created_at_batch
+from a7df32de3a60dfdb7a0b.stream import decode_tweets
+from a7df32de3a60dfdb7a0b.transform import accept_tweet, build_item, transform_tweets
+
+# The stand-in server lives with the tests, it is not part of the installed package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests"))
+from fake_server import FakeTweetServer  # noqa: E402
+
+
+def eager_items(pairs, author_hasher):
+    created_ats = format_created_at_batch([tweet.get("created_at_", "") for tweet, _ in pairs])
+    return [build_item(tweet, content, created_at, author_hasher) for (tweet, content), created_at in zip(pairs, created_ats)]
+
+
+def fill(body: bytes, build, author_hasher) -> ItemBuffer:
+    """Decode a response body and buffer what `build` makes of its tweets, like a fetch does."""
+    tweets = decode_tweets(body, "application/json")
+    pairs = [(tweet, accept_tweet(tweet)) for tweet in tweets]
+    entries = build(pairs, author_hasher)
+    buffer = ItemBuffer(capacity=len(entries))
+    for entry in entries:
+        buffer.put_nowait(entry)
+    return buffer
+
+
+def measure(body: bytes, build, author_hasher):
+    """Fill a buffer, returning (seconds, bytes the buffer keeps alive once the raw tweets are gone, buffer)."""
+    started = time.perf_counter()
+    fill(body, build, author_hasher).clear()
+    seconds = time.perf_counter() - started
+    # Traced separately since tracing slows the build down
+    tracemalloc.start()
+    buffer = fill(body, build, author_hasher)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, memory, buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50_000, help="tweets buffered")
+    parser.add_argument("--yielded", type=float, default=0.25, help="share of the buffer handed out before the query ends")
+    args = parser.parse_args()
+
+    tweets = FakeTweetServer(seed=0).make_tweets(args.items)
+    body = json.dumps({"tweets": tweets}).encode("utf-8")
+    author_hasher = get_author_hasher()
+    for author in {tweet["author_"] for tweet in tweets}:
+        author_hasher(author)  # The hasher's cache is long-lived, keep it out of the measurement
+    del tweets
+
+    eager_seconds, eager_memory, _ = measure(body, eager_items, author_hasher)
+    lazy_seconds, lazy_memory, buffer = measure(body, transform_tweets, author_hasher)
+    handed_out = int(args.items * args.yielded)
+    started = time.perf_counter()
+    for record in buffer.pop_many(handed_out):
+        record.to_item()
+    materialize_seconds = time.perf_counter() - started
+
+    print(f"{args.items} buffered tweets, {handed_out} handed out; build includes decoding the response")
+    print(f"{'':<10} {'MiB':>8} {'bytes/tweet':>12} {'build ms':>10} {'yield ms':>10}")
+    print(f"{'items':<10} {eager_memory / 2**20:8.1f} {eager_memory / args.items:12.0f} {eager_seconds * 1e3:10.1f} {0.0:10.1f}")
+    print(f"{'records':<10} {lazy_memory / 2**20:8.1f} {lazy_memory / args.items:12.0f} {lazy_seconds * 1e3:10.1f} {materialize_seconds * 1e3:10.1f}")
+    print(f"memory saved {1 - lazy_memory / eager_memory:.0%}, CPU saved {1 - (lazy_seconds + materialize_seconds) / eager_seconds:.0%}")
+
+
+if __name__ == "__main__":
+    main()
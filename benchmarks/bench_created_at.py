@@ -0,0 +1,45 @@
+"""Micro-benchmark of the created_at conversion paths.
+
+Run with the package installed (pip install -e .): python benchmarks/bench_created_at.py
+"""
+import random
+import timeit
+
+from a7df32de3a60dfdb7a0b.dates import format_created_at, format_created_at_batch, format_created_at_slow
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+BATCH_SIZE = 500
+REPEAT = 5
+NUMBER = 20
+
+
+def sample_batch(size: int):
+    """Timestamps of one synthetic batch, with the repeats a busy stream has."""
+    base = [
+        f"{random.choice(WEEKDAYS)} {random.choice(MONTHS)} {random.randint(1, 28):02d} "
+        f"{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d} +0000 2024"
+        for _ in range(size // 2)
+    ]
+    return [random.choice(base) for _ in range(size)]
+
+
+def main():
+    random.seed(0)
+    values = sample_batch(BATCH_SIZE)
+    assert [format_created_at_slow(v) for v in values] == format_created_at_batch(values)
+
+    cases = {
+        "strptime/strftime": lambda: [format_created_at_slow(v) for v in values],
+        "fast per item": lambda: [format_created_at(v) for v in values],
+        "fast batch": lambda: format_created_at_batch(values),
+    }
+    baseline = None
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, repeat=REPEAT, number=NUMBER)) / (NUMBER * BATCH_SIZE)
+        baseline = baseline or best
+        print(f"{name:<20} {best * 1e9:8.0f} ns/item  {baseline / best:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Cold-start benchmark: import time of the package and time to its first item.
+
+Every sample runs in a fresh interpreter so nothing is cached in-process.
+Run from an environment where the package is installed (pip install -e .):
+
+    python benchmarks/bench_import.py               # import and startup
+    python benchmarks/bench_import.py --runs 20 --top 15
+"""
+import argparse
+import statistics
+import os
+import subprocess
+import sys
+
+PACKAGE = "a7df32de3a60dfdb7a0b"
+# The stand-in server lives with the tests, it is not part of the installed package
+TESTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests")
+
+# Measures the import, then one query for a single item against the local stand-in server
+STARTUP_SCRIPT = f"""
+import time
+started = time.perf_counter()
+import {PACKAGE}
+imported = time.perf_counter()
+import asyncio
+import sys
+sys.path.insert(0, {TESTS_DIR!r})
+from fake_server import FakeTweetServer
+
+async def first_item():
+    async with FakeTweetServer(seed=0) as server:
+        parameters = {{"url": server.url, "size": 1, "maximum_items_to_collect": 1}}
+        async for _ in {PACKAGE}.query(parameters):
+            return time.perf_counter()
+
+done = asyncio.run(first_item())
+print((imported - started) * 1000, (done - started) * 1000)
+"""
+
+
+def run_startup() -> tuple:
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], check=True, capture_output=True, text=True).stdout
+    import_ms, first_item_ms = output.split()
+    return float(import_ms), float(first_item_ms)
+
+
+def slowest_imports(top: int) -> list:
+    """Modules with the highest cumulative import time, from -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {PACKAGE}"], check=True, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters to sample")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list, 0 for none")
+    args = parser.parse_args(argv)
+
+    samples = [run_startup() for _ in range(args.runs)]
+    imports = [sample[0] for sample in samples]
+    first_items = [sample[1] for sample in samples]
+    print(f"import      median {statistics.median(imports):8.1f} ms   min {min(imports):8.1f} ms")
+    print(f"first item  median {statistics.median(first_items):8.1f} ms   min {min(first_items):8.1f} ms")
+    if args.top:
+        print("\nslowest imports (cumulative):")
+        for cumulative, name in slowest_imports(args.top):
+            print(f"{cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark of the near-duplicate index: latency per check, memory per entry and detection rates.
+
+A synthetic stream mixes new texts with retweets and lightly edited copies
+of recent ones. Run with the package installed (pip install -e .):
+
+    python benchmarks/bench_neardup.py
+    python benchmarks/bench_neardup.py --capacity 100000 --items 200000 --threshold 0.7
+"""
+import argparse
+import itertools
+import random
+import time
+import tracemalloc
+
+from a7df32de3a60dfdb7a0b.neardup import NearDuplicateIndex, DEFAULT_NEAR_DUP_CAPACITY, DEFAULT_NEAR_DUP_THRESHOLD
+
+VOCABULARY_SIZE = 20_000
+DUPLICATE_SHARE = 0.4  # Share of the stream that repeats recent content
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def make_stream(items: int, seed: int = 0):
+    """(text, is_near_duplicate) pairs: new texts, retweets and copies with one word changed."""
+    generator = random.Random(seed)
+    # Skewed word frequencies like real text
+    vocabulary = [f"w{i}" for i in range(VOCABULARY_SIZE)]
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(VOCABULARY_SIZE)))
+    recent = []
+    stream = []
+    for _ in range(items):
+        if recent and generator.random() < DUPLICATE_SHARE:
+            words = list(generator.choice(recent[-1000:]))
+            if generator.random() < 0.5:
+                stream.append((f"RT @user{generator.randrange(1000)}: {' '.join(words)} https://t.co/{generator.randrange(10**6)}", True))
+            else:
+                words[generator.randrange(len(words))] = generator.choice(vocabulary)
+                stream.append((" ".join(words), True))
+        else:
+            words = generator.choices(vocabulary, cum_weights=cum_weights, k=generator.randint(12, 40))
+            recent.append(words)
+            stream.append((" ".join(words), False))
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50_000, help="texts checked")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_NEAR_DUP_CAPACITY, help="fingerprints kept by the index")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_NEAR_DUP_THRESHOLD, help="similarity threshold")
+    args = parser.parse_args()
+
+    stream = make_stream(args.items)
+    index = NearDuplicateIndex(args.threshold, args.capacity)
+    latencies = []
+    caught = missed = false_positives = 0
+    for number, (text, is_duplicate) in enumerate(stream):
+        started = time.perf_counter()
+        original = index.check(text, str(number))
+        latencies.append(time.perf_counter() - started)
+        if is_duplicate:
+            caught += original is not None
+            missed += original is None
+        else:
+            false_positives += original is not None
+
+    # Memory of a full index, measured separately since tracing slows every check down
+    tracemalloc.start()
+    full = NearDuplicateIndex(args.threshold, args.capacity)
+    for number, (text, _) in enumerate(make_stream(args.capacity, seed=1)):
+        full.check(text, str(number))
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    duplicates = caught + missed
+    print(f"index           {index.bands} bands x {index.rows} rows, capacity {args.capacity}, threshold {args.threshold}")
+    print(f"check latency   p50 {percentile(latencies, 0.5) * 1e6:.0f} us  p99 {percentile(latencies, 0.99) * 1e6:.0f} us  max {max(latencies) * 1e6:.0f} us")
+    print(f"memory          {memory / 2**20:.1f} MiB for {len(full)} entries, {memory / max(1, len(full)):.0f} bytes/entry")
+    print(f"near duplicates {caught}/{duplicates} caught ({caught / max(1, duplicates):.1%})")
+    print(f"false positives {false_positives}/{len(stream) - duplicates} ({false_positives / max(1, len(stream) - duplicates):.2%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""End-to-end benchmark of query() against a local stand-in /get_tweets server.
+
+Each scenario runs in its own subprocess so peak RSS is measured per scenario.
+Run from an environment where the package is installed (pip install -e .):
+
+    python benchmarks/bench_query.py                      # every scenario
+    python benchmarks/bench_query.py --scenario prefetch  # a single one
+    python benchmarks/bench_query.py --latency 0.05 --error-rate 0.02 --items 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from a7df32de3a60dfdb7a0b import query
+
+# The stand-in server lives with the tests, it is not part of the installed package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests"))
+from fake_server import FakeTweetServer  # noqa: E402
+
+# Query parameters compared by default, on top of the common ones
+SCENARIOS = {
+    "baseline": {},
+    "prefetch": {"prefetch": True, "low_watermark": 50, "max_outstanding_fetches": 2},
+    "adaptive": {"prefetch": True, "adaptive_size": True},
+    "stream": {"stream": True},
+    "dedup": {"dedup": True},
+    "near_dup_tag": {"near_dup": "tag"},  # Tagging keeps every item, the synthetic tweets all look alike
+    "thread_transform": {"transform_executor": "thread", "transform_workers": 2},
+    "gzip": {"compression": "gzip"},
+    "zstd": {"compression": "zstd"},
+    "msgpack": {"wire_format": "msgpack", "compression": "identity"},
+}
+
+# Server options of the scenarios that need the server to negotiate formats
+SCENARIO_SERVERS = {
+    "gzip": {"encodings": ["gzip"]},
+    "zstd": {"encodings": ["zstd"]},
+    "msgpack": {"msgpack": True},
+}
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def measure(parameters: dict, server_options: dict) -> dict:
+    """Run one query to completion and collect its timings."""
+    async with FakeTweetServer(**server_options) as server:
+        parameters = dict(parameters, url=server.url, retry_base_delay=0.01, retry_max_delay=0.1)
+        gaps = []
+        count = 0
+        started = time.perf_counter()
+        first_item = None
+        previous = started
+        async for _ in query(parameters):
+            now = time.perf_counter()
+            if first_item is None:
+                first_item = now - started
+            gaps.append(now - previous)
+            previous = now
+            count += 1
+        elapsed = time.perf_counter() - started
+        requests = server.requests
+        bytes_sent = server.bytes_sent
+    return {
+        "items": count,
+        "seconds": elapsed,
+        "items_per_second": count / elapsed if elapsed else 0.0,
+        "time_to_first_item_ms": (first_item or 0.0) * 1000,
+        "p50_item_latency_us": percentile(gaps, 0.50) * 1e6,
+        "p99_item_latency_us": percentile(gaps, 0.99) * 1e6,
+        "mean_item_latency_us": statistics.fmean(gaps) * 1e6 if gaps else 0.0,
+        "requests": requests,
+        "kb_per_request": bytes_sent / requests / 1024 if requests else 0.0,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), help="run a single scenario in this process")
+    parser.add_argument("--items", type=int, default=10_000, help="maximum_items_to_collect")
+    parser.add_argument("--size", type=int, default=100, help="requested batch size")
+    parser.add_argument("--latency", type=float, default=0.01, help="server latency per response in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--payload-size", type=int, default=140, help="characters of content per tweet")
+    parser.add_argument("--max-batch-size", type=int, default=None, help="cap on tweets per response")
+    parser.add_argument("--rate-limit", type=int, default=None, help="requests per second the server accepts before answering 429")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    return parser.parse_args(argv)
+
+
+def run_scenario(args) -> dict:
+    parameters = dict(SCENARIOS[args.scenario], size=args.size, maximum_items_to_collect=args.items)
+    server_options = {
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "payload_size": args.payload_size,
+        "max_batch_size": args.max_batch_size,
+        "rate_limit": args.rate_limit,
+        "seed": 0,
+        **SCENARIO_SERVERS.get(args.scenario, {}),
+    }
+    return asyncio.run(measure(parameters, server_options))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.scenario:
+        result = run_scenario(args)
+        print(json.dumps(result) if args.json else result)
+        return
+
+    forwarded = [arg for arg in (argv if argv is not None else sys.argv[1:]) if arg != "--json"]
+    results = {}
+    for name in SCENARIOS:
+        output = subprocess.run(
+            [sys.executable, __file__, "--scenario", name, "--json", *forwarded],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[name] = json.loads(output.strip().splitlines()[-1])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<18}{'items/s':>10}{'ttfi ms':>10}{'p50 us':>10}{'p99 us':>10}{'requests':>10}{'KB/req':>10}{'rss MB':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<18}{result['items_per_second']:>10.0f}{result['time_to_first_item_ms']:>10.1f}"
+            f"{result['p50_item_latency_us']:>10.1f}{result['p99_item_latency_us']:>10.1f}"
+            f"{result['requests']:>10}{result['kb_per_request']:>10.1f}{result['peak_rss_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,15 @@ setup(
     name="a7df32de3a60dfdb7a0b",
     version="0.13.12",
     packages=find_packages(),
+    # The client only needs these; everything else is opt-in through extras
     install_requires=[
-        "snscrape",
         "exorde_data",
-        "aiohttp",
-        "python-dotenv",
-        "selenium==4.2.0",
-        "twikit",
-        "httpx-socks",
-        "pathlib"
+        "httpx",
     ],
-    extras_require={"dev": ["pytest", "pytest-cov", "pytest-asyncio"]},
+    extras_require={
+        "http2": ["httpx[http2]"],
+        "compression": ["brotli", "zstandard", "httpx>=0.27.1"],  # zstd decoding landed in httpx 0.27.1
+        "msgpack": ["msgpack"],
+        "dev": ["pytest", "pytest-cov", "pytest-asyncio"],
+    },
 )
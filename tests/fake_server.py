@@ -0,0 +1,341 @@
+import asyncio
+import bisect
+import gzip
+import itertools
+import json
+import math
+import time
+import random
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Stand-in for the upstream /get_tweets service, used by tests and benchmarks; not shipped with the package
+DEFAULT_PAYLOAD_SIZE = 140  # Characters of content per tweet
+DEFAULT_AUTHOR_COUNT = 1000
+DEFAULT_PUSH_INTERVAL = 0.05  # Seconds between pushed batches on /subscribe
+DEFAULT_PUSH_HISTORY = 10_000  # Pushed tweets kept so subscribers can resume
+DEFAULT_HEARTBEAT = 5.0  # Seconds of silence before a heartbeat comment
+WORDS = ["market", "crypto", "news", "breaking", "price", "today", "launch", "update", "bitcoin", "stocks", "vote", "rain"]
+
+
+class FakeTweetServer:
+    """Minimal HTTP/1.1 server answering `POST /get_tweets` with synthetic tweets.
+
+    `latency` delays every response, `error_rate` is the share of requests
+    answered with a 500, `payload_size` sets the content length of each tweet
+    and `max_batch_size` caps how many tweets a response holds. Authors follow
+    a skewed distribution like a busy real stream. With `rate_limit`, at most
+    that many requests are served per `rate_window` seconds; responses carry
+    `RateLimit-Remaining`/`RateLimit-Reset` headers and requests over the
+    limit get a 429 with `Retry-After`. Responses are compressed with the
+    first coding from the request's Accept-Encoding that is listed in
+    `encodings` ("gzip", "br", "zstd") and sent as MessagePack when `msgpack`
+    is set and the request accepts it. With `filters`, the `keywords`,
+    `min_length` and `domains` fields of the request body are honoured and
+    only the matching share of the generated tweets is returned.
+
+    `GET /subscribe` is a text/event-stream push feed: `push_batch` tweets
+    are published every `push_interval` seconds and sent to every subscriber
+    as one event each, with the tweet id as event id. A `Last-Event-ID`
+    header resumes right after that tweet while it is among the last
+    `push_history` pushed; `drop_after` closes each connection after that
+    many events to exercise reconnects.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        payload_size: int = DEFAULT_PAYLOAD_SIZE,
+        max_batch_size: Optional[int] = None,
+        seed: Optional[int] = None,
+        rate_limit: Optional[int] = None,
+        rate_window: float = 1.0,
+        encodings: Sequence[str] = (),
+        msgpack: bool = False,
+        push_interval: float = DEFAULT_PUSH_INTERVAL,
+        push_batch: int = 10,
+        drop_after: Optional[int] = None,
+        heartbeat: float = DEFAULT_HEARTBEAT,
+        filters: bool = False,
+        push_history: int = DEFAULT_PUSH_HISTORY,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.payload_size = payload_size
+        self.max_batch_size = max_batch_size
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.throttled = 0
+        self.encodings = tuple(encodings)
+        self.msgpack = msgpack
+        self.bytes_sent = 0
+        self.push_interval = push_interval
+        self.push_batch = push_batch
+        self.drop_after = drop_after
+        self.heartbeat = heartbeat
+        self.filters = filters
+        self.subscriptions = 0
+        self.events_sent = 0
+        self.push_history = push_history
+        self._pushed_ids: List[int] = []
+        self._pushed_events: List[bytes] = []
+        self._pushed_trimmed = 0  # Events dropped from the front of the history
+        self._pushed = asyncio.Condition()
+        self._publisher: Optional[asyncio.Task] = None
+        self._window_start = 0.0
+        self._window_requests = 0
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self.last_request: Dict = {}  # Body of the latest /get_tweets request
+        self.tweets_served = 0
+        self._next_id = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._authors = [f"author_{i}" for i in range(DEFAULT_AUTHOR_COUNT)]
+        self._author_weights = list(itertools.accumulate(1 / (i + 1) for i in range(DEFAULT_AUTHOR_COUNT)))
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/get_tweets"
+
+    @property
+    def subscribe_url(self) -> str:
+        return f"http://{self.host}:{self.port}/subscribe"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._publisher is not None:
+            self._publisher.cancel()
+            await asyncio.gather(self._publisher, return_exceptions=True)
+            self._publisher = None
+        if self._server is not None:
+            self._server.close()
+            tasks = list(self._connections)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeTweetServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def make_tweet(self) -> Dict:
+        """Generate one synthetic tweet in the upstream wire format."""
+        self._next_id += 1
+        words = []
+        length = 0
+        while length < self.payload_size:
+            word = self.random.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        content = " ".join(words)[:self.payload_size]
+        return {
+            "content_": content,
+            "author_": self.random.choices(self._authors, cum_weights=self._author_weights)[0],
+            "created_at_": datetime.now(timezone.utc).strftime("%a %b %d %H:%M:%S %z %Y"),
+            "domain_": "x.com",
+            "url_": f"https://x.com/i/status/{self._next_id}",
+            "external_id_": str(self._next_id),
+        }
+
+    def make_tweets(self, size: int) -> List[Dict]:
+        if self.max_batch_size is not None:
+            size = min(size, self.max_batch_size)
+        return [self.make_tweet() for _ in range(max(0, size))]
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, path, headers, body
+
+    @staticmethod
+    def _response(status: str, body: bytes, content_type: str = "application/json", extra_headers: Optional[Dict[str, str]] = None) -> bytes:
+        headers = {"Content-Type": content_type, "Content-Length": str(len(body)), "Connection": "keep-alive"}
+        headers.update(extra_headers or {})
+        head = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        return f"HTTP/1.1 {status}\r\n{head}\r\n".encode("latin-1") + body
+
+    def _rate_limit_headers(self) -> Optional[Dict[str, str]]:
+        """Count a request against the current window, None when it is over the limit."""
+        now = time.monotonic()
+        if now - self._window_start >= self.rate_window:
+            self._window_start = now
+            self._window_requests = 0
+        reset = self._window_start + self.rate_window - now
+        if self._window_requests >= self.rate_limit:
+            return None
+        self._window_requests += 1
+        return {"RateLimit-Remaining": str(self.rate_limit - self._window_requests), "RateLimit-Reset": f"{reset:.3f}"}
+
+    async def handle(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> bytes:
+        """Build the raw HTTP response for one request."""
+        if method != "POST" or path.split("?")[0] != "/get_tweets":
+            return self._response("404 Not Found", b'{"error": "not found"}')
+        extra_headers = None
+        if self.rate_limit is not None:
+            extra_headers = self._rate_limit_headers()
+            if extra_headers is None:
+                self.throttled += 1
+                reset = self._window_start + self.rate_window - time.monotonic()
+                return self._response(
+                    "429 Too Many Requests",
+                    b'{"error": "rate limited"}',
+                    extra_headers={"Retry-After": str(max(1, math.ceil(reset))), "RateLimit-Remaining": "0", "RateLimit-Reset": f"{reset:.3f}"},
+                )
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self._response("500 Internal Server Error", b'{"error": "synthetic failure"}')
+        request = self.last_request = json.loads(body or b"{}")
+        tweets = self.make_tweets(request.get("size", 0))
+        if self.filters:
+            tweets = [tweet for tweet in tweets if self._matches(tweet, request)]
+        self.tweets_served += len(tweets)
+        if self.msgpack and "msgpack" in headers.get("accept", ""):
+            import msgpack
+
+            content_type = "application/msgpack"
+            payload = msgpack.packb({"tweets": tweets})
+        else:
+            content_type = "application/json"
+            payload = json.dumps({"tweets": tweets}).encode("utf-8")
+        encoding = self._choose_encoding(headers.get("accept-encoding", ""))
+        if encoding is not None:
+            payload = self._compress(payload, encoding)
+            extra_headers = dict(extra_headers or {}, **{"Content-Encoding": encoding})
+        self.bytes_sent += len(payload)
+        return self._response("200 OK", payload, content_type, extra_headers)
+
+    @staticmethod
+    def _matches(tweet: Dict, request: Dict) -> bool:
+        content = tweet["content_"]
+        if len(content) < request.get("min_length", 0):
+            return False
+        if "domains" in request and tweet["domain_"] not in request["domains"]:
+            return False
+        if "keywords" in request:
+            return any(keyword in content.lower() for keyword in request["keywords"])
+        return True
+
+    def _choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        for token in accept_encoding.split(","):
+            encoding = token.split(";")[0].strip().lower()
+            if encoding in self.encodings:
+                return encoding
+        return None
+
+    @staticmethod
+    def _compress(payload: bytes, encoding: str) -> bytes:
+        if encoding == "gzip":
+            return gzip.compress(payload, compresslevel=6)
+        if encoding == "br":
+            import brotli
+
+            return brotli.compress(payload, quality=5)
+        if encoding == "zstd":
+            import zstandard
+
+            return zstandard.ZstdCompressor(level=3).compress(payload)
+        raise ValueError(f"Unsupported encoding '{encoding}'.")
+
+    async def publish(self, count: int):
+        """Push `count` new tweets to every subscriber, trimming the history beyond twice `push_history`."""
+        async with self._pushed:
+            for tweet in self.make_tweets(count):
+                self._pushed_ids.append(int(tweet["external_id_"]))
+                self._pushed_events.append(f"id: {tweet['external_id_']}\nevent: tweet\ndata: {json.dumps(tweet)}\n\n".encode("utf-8"))
+            self.tweets_served += count
+            if len(self._pushed_ids) > 2 * self.push_history:
+                trimmed = len(self._pushed_ids) - self.push_history
+                del self._pushed_ids[:trimmed]
+                del self._pushed_events[:trimmed]
+                self._pushed_trimmed += trimmed
+            self._pushed.notify_all()
+
+    async def _publish(self):
+        while True:
+            await asyncio.sleep(self.push_interval)
+            await self.publish(self.push_batch)
+
+    async def subscribe(self, headers: Dict[str, str], writer: asyncio.StreamWriter):
+        """Stream pushed tweets to one subscriber until it goes away or `drop_after` is reached."""
+        self.subscriptions += 1
+        if self._publisher is None:
+            self._publisher = asyncio.create_task(self._publish())
+        # Positions count every event ever pushed, including those trimmed from the history since
+        last_event_id = headers.get("last-event-id")
+        if last_event_id is not None and last_event_id.isdigit():
+            position = self._pushed_trimmed + bisect.bisect_right(self._pushed_ids, int(last_event_id))
+        else:
+            position = self._pushed_trimmed + len(self._pushed_ids)  # New subscribers only get new tweets
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+            + f"retry: {int(self.push_interval * 1000)}\n\n".encode("latin-1")
+        )
+        sent = 0
+        while True:
+            async with self._pushed:
+                try:
+                    await asyncio.wait_for(self._pushed.wait_for(lambda: self._pushed_trimmed + len(self._pushed_ids) > position), self.heartbeat)
+                except asyncio.TimeoutError:
+                    writer.write(b": heartbeat\n\n")
+                    await writer.drain()
+                    continue
+                # Events trimmed before this subscriber got them are lost, like on a real server
+                events = self._pushed_events[max(0, position - self._pushed_trimmed):]
+                position = self._pushed_trimmed + len(self._pushed_ids)
+            if self.drop_after is not None:
+                events = events[:self.drop_after - sent]
+            writer.write(b"".join(events))
+            await writer.drain()
+            sent += len(events)
+            self.events_sent += len(events)
+            self.bytes_sent += sum(len(event) for event in events)
+            if self.drop_after is not None and sent >= self.drop_after:
+                return
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections[asyncio.current_task()] = writer
+        self.connections += 1
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                self.requests += 1
+                method, path, headers, _ = request
+                if method == "GET" and path.split("?")[0] == "/subscribe":
+                    await self.subscribe(headers, writer)
+                    break
+                writer.write(await self.handle(*request))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # Client went away or the server is stopping
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
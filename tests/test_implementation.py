@@ -1,12 +1,788 @@
 from a7df32de3a60dfdb7a0b import query
+from fake_server import FakeTweetServer
 from exorde_data.models import Item
 import pytest
 
 
 @pytest.mark.asyncio
 async def test_query():
-    url = "https://twitter.com/search?q=financial&src=typed_query&f=live"
-    results = []
-    async for result in query(url):
-        assert isinstance(result, Item)
-        results.append(result)
+    from a7df32de3a60dfdb7a0b.client import close_client
+
+    async with FakeTweetServer(seed=0) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 25}
+        results = []
+        async for result in query(parameters):
+            assert isinstance(result, Item)
+            results.append(result)
+        # The next query reuses the pooled keep-alive connection
+        results.extend([item async for item in query(parameters)])
+        await close_client()
+    assert len(results) == 50
+    assert server.requests == 6
+    assert server.tweets_served == 50  # Requests stop at what the query still needs
+    assert server.connections == 1
+
+
+def test_shared_client_is_closed_when_replaced_on_a_new_event_loop():
+    import asyncio
+    from a7df32de3a60dfdb7a0b.client import acquire_client, close_client, release_client
+
+    async def use_client():
+        client = acquire_client()
+        await release_client(client)
+        await asyncio.sleep(0)  # Lets the replaced client close
+        return client
+
+    first = asyncio.run(use_client())
+    assert not first.is_closed  # Kept open for the next query
+    second = asyncio.run(use_client())
+    assert second is not first and first.is_closed and not second.is_closed
+    asyncio.run(close_client())
+    assert second.is_closed
+
+
+@pytest.mark.asyncio
+async def test_prefetch_requests_the_next_batch_while_items_are_consumed():
+    import asyncio
+
+    async with FakeTweetServer(seed=0, latency=0.02) as server:
+        for prefetch in (False, True):
+            parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 20, "prefetch": prefetch, "low_watermark": 5}
+            started = server.requests
+            requests_seen = []
+            async for _ in query(parameters):
+                requests_seen.append(server.requests - started)
+                await asyncio.sleep(0.01)  # The consumer is busy with each item
+            # With prefetch, the second batch was requested before the first one was used up
+            assert requests_seen[9] == (2 if prefetch else 1)
+            assert len(requests_seen) == 20 and server.requests - started == 2
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_blocks_producers_until_items_are_taken():
+    import asyncio
+    from a7df32de3a60dfdb7a0b.buffer import ItemBuffer
+
+    buffer = ItemBuffer(capacity=2)
+    await buffer.put("a")
+    await buffer.put("b")
+    blocked = [asyncio.create_task(buffer.put(item)) for item in ("c", "d")]
+    await asyncio.sleep(0.01)
+    assert len(buffer) == 2 and not any(task.done() for task in blocked)
+    # A producer cancelled while waiting does not take the wake-up of the next one
+    blocked[0].cancel()
+    assert buffer.popleft() == "a"
+    await asyncio.wait_for(blocked[1], 1)
+    assert buffer.pop_many(5) == ["b", "d"]
+    sized = ItemBuffer(capacity=10, max_bytes=10, sizeof=len)
+    await sized.put("12345678")
+    waiting = asyncio.create_task(sized.put("123"))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+    sized.clear()  # Wakes the producer, which then has room
+    await asyncio.wait_for(waiting, 1)
+    assert len(sized) == 1
+
+    # Responses larger than the buffer are taken in as the query makes room
+    async with FakeTweetServer(seed=0) as server:
+        parameters = {"url": server.url, "size": 20, "maximum_items_to_collect": 20, "buffer_capacity": 5}
+        assert len([item async for item in query(parameters)]) == 20
+    assert server.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_failing_endpoint_is_taken_out_of_rotation():
+    from a7df32de3a60dfdb7a0b.endpoints import get_endpoint_pool
+
+    async with FakeTweetServer(seed=0, error_rate=1.0) as failing, FakeTweetServer(seed=1) as healthy:
+        urls = [failing.url, healthy.url]
+        parameters = {"endpoints": urls, "size": 10, "maximum_items_to_collect": 30, "retry_base_delay": 0.01}
+        results = [item async for item in query(parameters)]
+    assert len(results) == 30
+    # The failed share was retried on the healthy endpoint, which got every later request
+    assert failing.requests == 1 and healthy.tweets_served == 30
+    pool = get_endpoint_pool(urls)
+    assert [endpoint.url for endpoint in pool.available()] == [healthy.url]
+    assert pool.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_adaptive_batch_size_carries_over_between_queries():
+    from a7df32de3a60dfdb7a0b.endpoints import get_endpoint_pool
+
+    async with FakeTweetServer(seed=0, latency=0.01) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 40, "adaptive_size": True, "max_size": 40, "target_latency": 0.1}
+        sizes = []
+        for _ in range(4):
+            [item async for item in query(parameters)]
+            sizes.append(server.last_request["size"])
+        sizer = get_endpoint_pool(server.url).batch_sizer(10, 10, 40, 0.1)
+        # Fast responses grow the batch until it reaches the cap, and the next queries start there
+        assert sizer.size == 40 and sizes[-1] == 40
+        server.latency = 0.15
+        [item async for item in query(dict(parameters, maximum_items_to_collect=10))]
+        assert sizer.size == 10  # A capped but slow request still shrinks the batch
+
+
+@pytest.mark.asyncio
+async def test_deduplication_windows_persist_and_only_count_yielded_items(tmp_path):
+    import time
+    from a7df32de3a60dfdb7a0b.dedup import BloomFilter, SeenIds
+    from a7df32de3a60dfdb7a0b.transform import TweetTransformer
+
+    seen = SeenIds(capacity=2)
+    assert seen.add("a") and seen.add("b") and not seen.add("a")
+    seen.add("c")  # Evicts "b", the least recently seen
+    assert "a" in seen and "b" not in seen and len(seen) == 2
+    expiring = SeenIds(ttl=0.01)
+    expiring.add("a")
+    time.sleep(0.02)
+    assert "a" not in expiring and expiring.add("a")
+    bloom = BloomFilter(capacity=100, error_rate=1e-6)
+    ids = [str(i) for i in range(250)]
+    assert all(bloom.add(i) for i in ids) and not bloom.add("249")
+    # Two rotations later only the last two generations are remembered
+    assert all(i in bloom for i in ids[100:]) and not any(i in bloom for i in ids[:50])
+
+    for kind in (SeenIds, BloomFilter):
+        path = str(tmp_path / f"{kind.__name__}.json")
+        deduplicator = kind(path=path)
+        transformer = TweetTransformer(dedup=deduplicator)
+        tweet = {"content_": "hello", "created_at_": "Wed Oct 10 20:19:24 +0000 2018", "external_id_": "1"}
+        assert transformer.accept(dict(tweet)) == "hello" and transformer.accept(dict(tweet)) is None
+        # Accepted but never yielded, so another query still accepts it
+        assert TweetTransformer(dedup=deduplicator).accept(dict(tweet)) == "hello"
+        record, = await transformer.transform([(tweet, "hello")]).__anext__()
+        transformer.yielded(record)
+        await transformer.save()
+        assert "1" in kind(path=path) and TweetTransformer(dedup=kind(path=path)).accept(dict(tweet)) is None
+
+
+def test_format_created_at_matches_strptime():
+    from a7df32de3a60dfdb7a0b.dates import format_created_at, format_created_at_batch, format_created_at_slow
+
+    values = [
+        "Wed Oct 10 20:19:24 +0000 2018",
+        "Thu Feb 29 23:59:59 -0530 2024",
+        "Mon Jan 01 00:00:00 +1400 2024",
+        "wed oct 10 20:19:24 +0000 2018",
+        "Wed Oct 10 20:19:24 +00:00 2018",
+    ]
+    assert [format_created_at(v) for v in values] == [format_created_at_slow(v) for v in values]
+    assert format_created_at_batch(values) == [format_created_at_slow(v) for v in values]
+    for invalid in ["Fri Feb 30 10:00:00 +0000 2023", "Wed Oct 10 24:00:00 +0000 2018", ""]:
+        with pytest.raises(ValueError):
+            format_created_at(invalid)
+
+
+@pytest.mark.asyncio
+async def test_author_digests_are_memoized_with_the_configured_hash():
+    import hashlib
+    from a7df32de3a60dfdb7a0b.authors import AuthorHasher, get_author_hasher
+
+    hasher = AuthorHasher(cache_size=2)
+    assert hasher("alice") == hashlib.sha1(b"alice").hexdigest()
+    hasher("alice")
+    hasher("bob")
+    hasher("carol")  # Evicts "alice", the least recently used
+    hasher("alice")
+    assert hasher.stats() == {"hits": 1, "misses": 4, "size": 2}
+    with pytest.raises(ValueError):
+        AuthorHasher("md5")
+
+    async with FakeTweetServer(seed=0) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 10, "author_hash": "blake2b", "author_digest_size": 16}
+        results = [item async for item in query(parameters)]
+    shared = get_author_hasher("blake2b", digest_size=16)
+    authors = {item.author for item in results}
+    assert all(len(author) == 32 for author in authors)
+    assert shared.stats()["size"] == len(authors) and shared.stats()["misses"] == len(authors)
+
+
+def test_stream_parsers_yield_tweets_across_chunk_boundaries():
+    import json
+    from a7df32de3a60dfdb7a0b.stream import parse_chunks
+
+    tweets = [{"content_": f"tweet [{i}] {{\"quoted\"}}", "external_id_": str(i)} for i in range(5)]
+    bodies = {
+        "application/json": json.dumps({"tweets": tweets}),
+        "application/x-ndjson": "\n".join(json.dumps(tweet) for tweet in tweets),
+    }
+    for content_type, body in bodies.items():
+        chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+        assert list(parse_chunks(chunks, content_type)) == tweets
+    with pytest.raises(ValueError):
+        list(parse_chunks([bodies["application/json"][:-10]]))
+
+
+@pytest.mark.asyncio
+async def test_streamed_query_yields_items_before_the_response_ends():
+    import asyncio
+    import json
+    import httpx
+
+    tweets = FakeTweetServer(seed=0).make_tweets(10)
+    rest_requested = asyncio.Event()
+
+    async def body():
+        for tweet in tweets[:5]:
+            yield (json.dumps(tweet) + "\n").encode("utf-8")
+        await rest_requested.wait()  # The rest only arrives once the first items were handed out
+        for tweet in tweets[5:]:
+            yield (json.dumps(tweet) + "\n").encode("utf-8")
+
+    def handler(request):
+        return httpx.Response(200, headers={"Content-Type": "application/x-ndjson"}, content=body())
+
+    async def consume(parameters):
+        ids = []
+        async for item in query(parameters):
+            ids.append(item.external_id)
+            rest_requested.set()
+        return ids
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        parameters = {"url": "http://streaming/get_tweets", "client": client, "size": 10, "maximum_items_to_collect": 10, "stream": True}
+        ids = await asyncio.wait_for(consume(parameters), 5)
+    assert ids == [tweet["external_id_"] for tweet in tweets]
+
+    async with FakeTweetServer(seed=0) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 25, "stream": True}
+        assert len([item async for item in query(parameters)]) == 25
+
+
+@pytest.mark.asyncio
+async def test_items_built_on_executors_match_the_event_loop():
+    from a7df32de3a60dfdb7a0b.transform import shutdown_executors
+
+    def fields(items):
+        return [(item.content, item.author, item.external_id, item.url) for item in items]
+
+    results = {}
+    for executor in (None, "thread", "process"):
+        async with FakeTweetServer(seed=0) as server:
+            parameters = {"url": server.url, "size": 25, "maximum_items_to_collect": 50, "transform_executor": executor, "transform_workers": 2, "transform_chunk_size": 7}
+            results[executor] = fields([item async for item in query(parameters)])
+    shutdown_executors()
+    assert len(results[None]) == 50
+    assert results["thread"] == results[None] and results["process"] == results[None]
+
+
+@pytest.mark.asyncio
+async def test_metrics_count_a_query_and_export_prometheus_text():
+    from a7df32de3a60dfdb7a0b import metrics
+
+    metrics.reset()
+    depth = metrics.BUFFER_DEPTH.value
+    async with FakeTweetServer(seed=0) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 20}
+        [item async for item in query(parameters)]
+    snapshot = metrics.snapshot()
+    assert snapshot["items_fetched_total"] == 20 and snapshot["items_yielded_total"] == 20
+    assert snapshot["fetch_latency_seconds"]["count"] == 2 and snapshot["fetch_latency_seconds"]["buckets"]["+Inf"] == 2
+    assert snapshot["fetch_batch_size"]["buckets"]["10"] == 2
+    assert snapshot["buffer_depth"] == depth  # Nothing is left buffered
+    text = metrics.prometheus_text()
+    assert "# TYPE tweets_client_fetch_latency_seconds histogram\n" in text
+    assert "tweets_client_items_yielded_total 20\n" in text
+    assert 'tweets_client_fetch_batch_size_bucket{le="+Inf"} 2\n' in text
+    metrics.reset()
+    assert metrics.snapshot()["items_yielded_total"] == 0
+
+
+@pytest.mark.asyncio
+async def test_query_batches_respects_maximum_and_chunk_size():
+    from a7df32de3a60dfdb7a0b import query_batches
+
+    async with FakeTweetServer(seed=0) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 25, "chunk_size": 4}
+        batches = [batch async for batch in query_batches(parameters)]
+    assert sum(len(batch) for batch in batches) == 25
+    assert all(0 < len(batch) <= 4 for batch in batches)
+    assert server.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_spool_keeps_leftovers_for_the_next_query(tmp_path):
+    import httpx
+    from a7df32de3a60dfdb7a0b.records import TweetRecord
+    from a7df32de3a60dfdb7a0b.spool import Spool
+
+    spool = Spool(str(tmp_path / "capped.db"), max_items=10)
+    spool.push([TweetRecord("hello", "someone", "2018-10-10T20:19:24.000000Z", "x.com", "", str(i)) for i in range(15)])
+    assert len(spool) == 10 and [record.external_id for record in spool.pop(3)] == ["5", "6", "7"]
+
+    requests = []
+    tweets = FakeTweetServer(seed=0).make_tweets(20)
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"tweets": tweets})  # More than asked for
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        parameters = {"url": "http://upstream/get_tweets", "client": client, "size": 5, "maximum_items_to_collect": 5, "spool_path": str(tmp_path / "spool.db")}
+        first = [item.external_id async for item in query(parameters)]
+        second = [item.external_id async for item in query(dict(parameters, maximum_items_to_collect=15))]
+    assert first + second == [tweet["external_id_"] for tweet in tweets]
+    assert len(requests) == 1  # The second query was served from the spool
+
+
+def test_shared_instances_are_not_reconfigured_by_other_queries(tmp_path):
+    from a7df32de3a60dfdb7a0b.coordinator import get_coordinator
+    from a7df32de3a60dfdb7a0b.endpoints import get_endpoint_pool
+    from a7df32de3a60dfdb7a0b.spool import get_spool
+
+    path = str(tmp_path / "shared.db")
+    spool = get_spool(path, max_items=10)
+    assert get_spool(path, max_items=10) is spool
+    with pytest.raises(ValueError):
+        get_spool(path, max_items=20)
+    assert spool.max_items == 10
+    coordinator = get_coordinator("shared", 100)
+    assert get_coordinator("shared", 100) is coordinator and get_coordinator("shared", 200) is not coordinator
+    assert coordinator.max_flight_size == 100
+    paced = get_endpoint_pool("http://shared/get_tweets", rate_limit=5)
+    assert get_endpoint_pool("http://shared/get_tweets", rate_limit=5) is paced
+    assert get_endpoint_pool("http://shared/get_tweets") is not paced and paced.limiter.max_rate == 5
+
+
+@pytest.mark.asyncio
+async def test_spooled_items_are_not_yielded_again_when_their_page_is_refetched(tmp_path):
+    import asyncio
+    import httpx
+
+    tweets = FakeTweetServer(seed=0).make_tweets(20)
+    pages = [tweets[:10], tweets[:10]]  # The first page is served again before newer tweets
+
+    def handler(request):
+        return httpx.Response(200, json={"tweets": pages.pop(0) if pages else tweets[10:]})
+
+    async def consume(parameters):
+        ids = []
+        async for item in query(parameters):
+            ids.append(item.external_id)
+            await asyncio.sleep(0.01)  # The refetch lands while spooled items are still buffered
+        return ids
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        parameters = {
+            "url": "http://refetch/get_tweets",
+            "client": client,
+            "size": 5,
+            "maximum_items_to_collect": 5,
+            "prefetch": True,
+            "dedup": True,
+            "dedup_path": str(tmp_path / "dedup.json"),
+            "spool_path": str(tmp_path / "spool.db"),
+        }
+        first = await consume(parameters)
+        second = await consume(dict(parameters, maximum_items_to_collect=10))
+    assert first + second == [tweet["external_id_"] for tweet in tweets[:15]]
+
+
+@pytest.mark.asyncio
+async def test_batches_of_rejected_tweets_are_followed_by_a_backoff(tmp_path):
+    import json
+    import httpx
+
+    tweets = FakeTweetServer(seed=0).make_tweets(10)
+    sizes = []
+
+    def handler(request):
+        sizes.append(json.loads(request.content)["size"])
+        return httpx.Response(200, json={"tweets": tweets})  # Nothing new ever shows up
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        parameters = {
+            "url": "http://stale/get_tweets",
+            "client": client,
+            "size": 10,
+            "maximum_items_to_collect": 15,
+            "dedup": True,
+            "dedup_path": str(tmp_path / "dedup.json"),
+            "retry_base_delay": 0.1,
+            "deadline": 1.0,
+        }
+        items = [item async for item in query(parameters)]
+    assert len(items) == 10
+    assert 2 <= len(sizes) <= 6
+    assert set(sizes) == {10}  # Not shrunk to the 5 items still needed
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_coalesce_requests():
+    import asyncio
+    import httpx
+
+    async def consume(parameters):
+        return [item.external_id async for item in query(parameters)]
+
+    async with FakeTweetServer(seed=0, latency=0.01) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 30, "coalesce": "test"}
+        results = await asyncio.gather(*[consume(parameters) for _ in range(4)])
+    assert [len(ids) for ids in results] == [30] * 4
+    assert len({i for ids in results for i in ids}) == 120
+    assert server.requests == 3
+
+    # An upstream sending more than the flight asked for must not stall it
+    tweets = FakeTweetServer(seed=0).make_tweets(50)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"tweets": tweets}))) as client:
+        parameters = {"url": "http://oversized/get_tweets", "client": client, "size": 10, "maximum_items_to_collect": 10, "coalesce": "oversized"}
+        results = await asyncio.wait_for(asyncio.gather(consume(parameters), consume(parameters)), 5)
+    assert [len(ids) for ids in results] == [10, 10]
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_recovers_after_a_trial_without_verdict():
+    import asyncio
+    import httpx
+    from a7df32de3a60dfdb7a0b import request_tweets
+    from a7df32de3a60dfdb7a0b.endpoints import EndpointPool
+    from a7df32de3a60dfdb7a0b.retry import CircuitOpenError, RetryBudgetExhausted, RetryPolicy
+
+    answers = []  # Status codes to answer with, 200 once used up
+
+    async def handler(request):
+        status = answers.pop(0) if answers else 200
+        if status is None:
+            await asyncio.sleep(10)  # Hangs until cancelled
+        return httpx.Response(status or 200, headers={"Retry-After": "0"}, json={"tweets": [{"content_": "hello"}]})
+
+    endpoints = EndpointPool(["http://upstream/get_tweets"], cooldown=0)
+    breaker = endpoints.breaker
+    breaker.failure_threshold = 2
+    breaker.reset_timeout = 0.05
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        answers[:] = [500, 500]
+        with pytest.raises(RetryBudgetExhausted):
+            await request_tweets(client, endpoints, 1, retry=RetryPolicy(base_delay=0, max_retries=1))
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await request_tweets(client, endpoints, 1)
+        # Trials that are cancelled or hit a non-retryable error hand the trial back
+        await asyncio.sleep(0.05)
+        answers[:] = [None]
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(request_tweets(client, endpoints, 1), 0.05)
+        answers[:] = [400]
+        with pytest.raises(httpx.HTTPStatusError):
+            await request_tweets(client, endpoints, 1)
+        assert breaker.state == "half-open"
+        # A throttled trial is retried after the pause, and that retry may be the next trial
+        answers[:] = [429]
+        assert len(await request_tweets(client, endpoints, 1)) == 1
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_query_follows_upstream_rate_limit():
+    from a7df32de3a60dfdb7a0b.ratelimit import parse_retry_after
+
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412470.0) == 10.0
+    assert parse_retry_after("soon") is None
+    async with FakeTweetServer(seed=0, rate_limit=2, rate_window=0.2) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 60}
+        results = [item async for item in query(parameters)]
+    assert len(results) == 60
+    assert server.requests - server.throttled == 6
+
+
+@pytest.mark.asyncio
+async def test_throttling_slows_down_only_as_much_as_needed():
+    import time
+    import httpx
+    from a7df32de3a60dfdb7a0b.endpoints import get_endpoint_pool
+    from a7df32de3a60dfdb7a0b.ratelimit import TokenBucket
+
+    # Throttled before any rate was observed, only the Retry-After pause applies
+    statuses = [429]
+    tweets = FakeTweetServer(seed=0).make_tweets(5)
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0) if statuses else 200, headers={"Retry-After": "0"}, json={"tweets": tweets})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        parameters = {"url": "http://throttled/get_tweets", "client": client, "size": 5, "maximum_items_to_collect": 20}
+        started = time.monotonic()
+        assert len([item async for item in query(parameters)]) == 20
+        assert time.monotonic() - started < 0.5
+    limiter = get_endpoint_pool("http://throttled/get_tweets").limiter
+    assert limiter.throttled == 1 and limiter.rate is None
+
+    # Throttled at an observed pace, it is halved and unlimited again once past that pace
+    bucket = TokenBucket()
+    for _ in range(3):
+        await bucket.acquire()
+    observed = bucket.observed_rate()
+    bucket.record_throttled(0)
+    assert bucket.rate == max(1.0, observed / 2)
+    successes = 0
+    while bucket.rate is not None:
+        bucket.record_success()
+        successes += 1
+    assert successes <= 4
+    # A configured limit is never exceeded while recovering
+    limited = TokenBucket(max_rate=4)
+    limited.record_throttled(0)
+    assert limited.rate == 2
+    for _ in range(10):
+        limited.record_success()
+    assert limited.rate == 4
+
+
+@pytest.mark.asyncio
+async def test_deadline_ends_query_with_partial_results_and_read_timeout_applies():
+    import time
+    from a7df32de3a60dfdb7a0b.client import request_timeout
+    from a7df32de3a60dfdb7a0b.retry import RetryBudgetExhausted
+
+    timeout = request_timeout({"timeout": 2.0, "read_timeout": 0.05})
+    assert (timeout.connect, timeout.read, timeout.write, timeout.pool) == (2.0, 0.05, 2.0, 2.0)
+    async with FakeTweetServer(seed=0, latency=0.2) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 100, "deadline": 0.5}
+        started = time.monotonic()
+        results = [item async for item in query(parameters)]
+        elapsed = time.monotonic() - started
+        assert 10 <= len(results) <= 20  # Responses arrive every 0.2 seconds, the last one was still in flight
+        assert 0.5 <= elapsed < 0.8
+        # Responses slower than the read timeout fail instead of stalling the query
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 10, "read_timeout": 0.05, "max_retries": 1, "retry_base_delay": 0.01}
+        started = time.monotonic()
+        with pytest.raises(RetryBudgetExhausted):
+            [item async for item in query(parameters)]
+        assert time.monotonic() - started < 0.35  # Less than two responses' latency
+
+
+def test_msgpack_parser_yields_tweets_across_chunk_boundaries():
+    msgpack = pytest.importorskip("msgpack")
+    from a7df32de3a60dfdb7a0b.stream import decode_tweets, parser_for
+
+    tweets = [{"content_": f"tweet {i}", "external_id_": str(i)} for i in range(5)]
+    for body in (msgpack.packb({"tweets": tweets}), b"".join(msgpack.packb(tweet) for tweet in tweets)):
+        parser = parser_for("application/msgpack")
+        parsed = []
+        for i in range(0, len(body), 7):
+            parsed.extend(parser.feed(body[i:i + 7]))
+        assert parsed + parser.close() == tweets
+        assert decode_tweets(body, "application/msgpack") == tweets
+    parser = parser_for("application/msgpack")
+    parser.feed(msgpack.packb({"tweets": tweets})[:-3])
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+@pytest.mark.asyncio
+async def test_query_decodes_negotiated_br_and_zstd_responses():
+    pytest.importorskip("brotli")
+    pytest.importorskip("zstandard")
+    from a7df32de3a60dfdb7a0b.wire import request_headers
+
+    assert request_headers(compression="zstd, br")["Accept-Encoding"] == "zstd, br"
+    sent = {}
+    for encoding in (None, "br", "zstd"):
+        for stream in (False, True):
+            async with FakeTweetServer(seed=0, encodings=["br", "zstd"]) as server:
+                parameters = {"url": server.url, "size": 20, "maximum_items_to_collect": 20, "compression": encoding or "identity", "stream": stream}
+                results = [item async for item in query(parameters)]
+            assert len(results) == 20 and all(item.content for item in results)
+            sent[encoding, stream] = server.bytes_sent
+    # The server only compressed what the request offered to decode
+    assert all(sent[encoding, stream] < sent[None, stream] / 2 for encoding in ("br", "zstd") for stream in (False, True))
+
+
+@pytest.mark.asyncio
+async def test_subscription_reconnects_and_resumes():
+    import json
+    import httpx
+    from a7df32de3a60dfdb7a0b.subscribe import Subscription
+
+    async with FakeTweetServer(seed=0, push_interval=0.01, push_batch=5, drop_after=7) as server:
+        parameters = {"url": server.url, "subscribe_url": server.subscribe_url, "maximum_items_to_collect": 30}
+        first = [int(item.external_id) async for item in query(parameters)]
+        second = [int(item.external_id) async for item in query(parameters)]
+    assert first + second == list(range(first[0], first[0] + 60))
+    assert server.subscriptions >= 60 // 7
+
+    # Events holding several tweets, resumed after a query stopped halfway through one
+    events = [("1", [1, 2, 3]), ("2", [4, 5]), ("3", [6])]
+
+    def handler(request):
+        last = int(request.headers.get("last-event-id", 0))
+        body = "retry: 1\n\n" + "".join(
+            f"id: {event_id}\ndata: {json.dumps([{'external_id_': str(i)} for i in ids])}\n\n" for event_id, ids in events if int(event_id) > last
+        )
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, text=body)
+
+    subscription = Subscription("http://upstream/subscribe")
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        received = []
+        for limit in (2, 3, 1):
+            received.append([int(tweet["external_id_"]) async for tweet in subscription.tweets(client, limit=limit)])
+    assert received == [[1, 2], [3, 4, 5], [6]]
+
+
+@pytest.mark.asyncio
+async def test_subscription_resumes_after_the_server_trimmed_its_history():
+    import asyncio
+
+    async def consume(parameters):
+        return [int(item.external_id) async for item in query(parameters)]
+
+    # Tweets are only published when the test says so
+    async with FakeTweetServer(seed=0, push_interval=3600, push_history=5) as server:
+        parameters = {"url": server.url, "subscribe_url": server.subscribe_url, "maximum_items_to_collect": 3}
+        first = asyncio.create_task(consume(parameters))
+        while server.subscriptions == 0:
+            await asyncio.sleep(0.01)
+        await server.publish(4)
+        assert await first == [1, 2, 3]
+        await server.publish(20)  # Keeps only the last 5 of the 24 tweets
+        second = await asyncio.wait_for(consume(dict(parameters, maximum_items_to_collect=5)), 5)
+    # Tweets trimmed before the subscriber came back are lost, the rest follow in order
+    assert second == [20, 21, 22, 23, 24]
+
+
+@pytest.mark.asyncio
+async def test_query_filters_tweets_before_building_items():
+    from a7df32de3a60dfdb7a0b.filters import KeywordMatcher
+
+    from a7df32de3a60dfdb7a0b.filters import TweetFilter
+    from a7df32de3a60dfdb7a0b.transform import transform_tweets
+    from a7df32de3a60dfdb7a0b.authors import get_author_hasher
+
+    matcher = KeywordMatcher(["he", "she", "his", "hers"])
+    assert matcher.search("uSHErs") and matcher.search("ahis") and not matcher.search("hi sh")
+    # Ages are compared in UTC, the Item keeps the local time as always
+    recent = {"content_": "hi", "created_at_": "Wed Oct 10 20:19:24 -0500 2018"}  # 01:19 UTC on the 11th
+    old = {"content_": "hi", "created_at_": "Thu Oct 11 08:00:00 +0900 2018"}  # 23:00 UTC on the 10th
+    since = TweetFilter(since="2018-10-11T00:00:00+00:00")
+    assert since.accept(recent, "hi") and not since.accept(old, "hi")
+    record, = transform_tweets([(recent, "hi")], get_author_hasher())
+    assert record.created_at == "2018-10-10T20:19:24.000000Z"
+    for filter_pushdown in (False, True):
+        async with FakeTweetServer(seed=0, payload_size=16, filters=True) as server:
+            parameters = {
+                "url": server.url,
+                "size": 20,
+                "maximum_items_to_collect": 30,
+                "keywords": ["Bitcoin", "vote"],
+                "min_length": 12,
+                "filter_pushdown": filter_pushdown,
+            }
+            results = [item async for item in query(parameters)]
+        assert len(results) == 30
+        assert all(len(item.content) >= 12 and ("bitcoin" in item.content or "vote" in item.content) for item in results)
+        # Pushed down, the upstream only sends matching tweets
+        assert (server.tweets_served <= 40) == filter_pushdown
+
+
+def test_near_duplicates_are_dropped_or_tagged():
+    from a7df32de3a60dfdb7a0b.neardup import NearDuplicateIndex
+    from a7df32de3a60dfdb7a0b.transform import TweetTransformer
+
+    original = "breaking the central bank raises rates by half a point as inflation stays high across the region"
+    copies = [
+        "RT @someone: " + original + " https://t.co/abc",
+        original.replace("half a point", "half a percentage point"),
+    ]
+    unrelated = "rain expected all weekend across the north with strong winds on the coast and cooler nights"
+    index = NearDuplicateIndex(capacity=2)
+    assert index.check(original, "1") is None
+    assert [index.check(copy, "x") for copy in copies] == ["1", "1"]
+    assert index.check(unrelated, "2") is None
+    index.check("a third unrelated text about football scores and transfers this summer window", "3")
+    assert len(index) == 2 and index.check(original, "4") is None  # Evicted
+
+    tweets = [{"content_": content, "external_id_": str(i)} for i, content in enumerate([original] + copies + [unrelated])]
+    transformer = TweetTransformer(near_duplicates=NearDuplicateIndex())
+    assert [transformer.accept(dict(tweet)) is not None for tweet in tweets] == [True, False, False, True]
+    transformer = TweetTransformer(near_duplicates=NearDuplicateIndex(), near_duplicate_action="tag")
+    tagged = [dict(tweet) for tweet in tweets]
+    assert all(transformer.accept(tweet) is not None for tweet in tagged)
+    assert [tweet.get("external_parent_id_") for tweet in tagged] == [None, "0", "0", None]
+
+
+def test_near_duplicate_index_only_holds_yielded_content():
+    from a7df32de3a60dfdb7a0b.neardup import NearDuplicateIndex
+    from a7df32de3a60dfdb7a0b.transform import TweetTransformer, transform_tweets
+
+    original = "breaking the central bank raises rates by half a point as inflation stays high across the region"
+    copy = "RT @someone: " + original
+    for action in ("drop", "tag"):
+        index = NearDuplicateIndex()
+        # Accepted by a query that ended before handing its item out
+        assert TweetTransformer(near_duplicates=index, near_duplicate_action=action).accept({"content_": original, "external_id_": "1"})
+        assert len(index) == 0
+        # Refetched by the next query, it is neither lost nor tagged as its own copy
+        transformer = TweetTransformer(near_duplicates=index, near_duplicate_action=action)
+        refetched = {"content_": original, "created_at_": "Wed Oct 10 20:19:24 +0000 2018", "external_id_": "1"}
+        content = transformer.accept(refetched)
+        assert content is not None and "external_parent_id_" not in refetched
+        # Copies are caught while it is held, and by later queries once it was yielded
+        assert (transformer.accept({"content_": copy, "external_id_": "2"}) is not None) == (action == "tag")
+        transformer.yielded(transform_tweets([(refetched, content)], transformer.author_hasher)[0])
+        later = {"content_": copy, "external_id_": "3"}
+        assert (TweetTransformer(near_duplicates=index, near_duplicate_action=action).accept(later) is not None) == (action == "tag")
+        assert later.get("external_parent_id_") == ("1" if action == "tag" else None)
+
+
+@pytest.mark.asyncio
+async def test_cursor_resumes_after_restart_and_skips_old_tweets(tmp_path):
+    from a7df32de3a60dfdb7a0b import cursor as cursor_module
+    from a7df32de3a60dfdb7a0b.transform import TweetTransformer
+
+    path = str(tmp_path / "cursor.json")
+    async with FakeTweetServer(seed=0) as server:
+        parameters = {"url": server.url, "size": 10, "maximum_items_to_collect": 15, "cursor": "test", "cursor_path": path}
+        first = [item async for item in query(parameters)]
+        cursor_module._cursors.clear()  # As if the worker restarted
+        [item async for item in query(dict(parameters, maximum_items_to_collect=5))]
+        # The buffered but never yielded tweets of the first query are not skipped
+        assert server.last_request["cursor"] == first[-1].external_id
+
+    restored = cursor_module.Cursor(path)
+    assert restored.created_at is not None
+    transformer = TweetTransformer(cursor=restored)
+    old = {"content_": "old", "created_at_": "Wed Oct 10 20:19:24 +0000 2018", "external_id_": "1"}
+    new = {"content_": "new", "created_at_": "Wed Oct 10 20:19:24 +0000 2098", "external_id_": "2"}
+    assert transformer.accept(old) is None and transformer.accept(new) == "new"
+    assert transformer.upstream_fields()["cursor"] == restored.external_id
+
+    # The mark is kept in UTC, so tweets with other offsets are compared by when they were written
+    transformer = TweetTransformer(cursor=cursor_module.Cursor())
+    west = {"content_": "west", "created_at_": "Wed Oct 10 20:00:00 -0500 2018", "external_id_": "3"}
+    record, = await transformer.transform([(west, transformer.accept(west))]).__anext__()
+    assert record.created_at == "2018-10-10T20:00:00.000000Z"
+    transformer.yielded(record)
+    assert transformer.cursor.created_at == "2018-10-11T01:00:00.000000Z"
+    east = {"content_": "east", "created_at_": "Thu Oct 11 09:00:00 +0900 2018", "external_id_": "4"}
+    same = {"content_": "same", "created_at_": "Thu Oct 11 03:00:00 +0200 2018", "external_id_": "5"}
+    assert transformer.accept(east) is None and transformer.accept(same) == "same"
+
+
+def test_buffered_records_become_items_when_yielded(tmp_path):
+    import pickle
+    from a7df32de3a60dfdb7a0b.authors import get_author_hasher
+    from a7df32de3a60dfdb7a0b.dates import tweet_created_at
+    from a7df32de3a60dfdb7a0b.records import TweetRecord
+    from a7df32de3a60dfdb7a0b.spool import Spool
+    from a7df32de3a60dfdb7a0b.transform import build_item, transform_tweets
+
+    tweet = {"content_": "hello", "author_": "someone", "created_at_": "Wed Oct 10 20:19:24 +0000 2018", "external_id_": "7", "external_parent_id_": "3"}
+    record, = transform_tweets([(tweet, "hello")], get_author_hasher())
+    assert isinstance(record, TweetRecord) and not hasattr(record, "__dict__")
+    assert record.to_item() == build_item(tweet, "hello", "2018-10-10T20:19:24.000000Z", get_author_hasher())
+    assert pickle.loads(pickle.dumps(record)).to_item() == record.to_item()
+    spool = Spool(str(tmp_path / "spool.db"))
+    spool.push([record])
+    restored, = spool.pop(1)
+    assert restored.to_item() == record.to_item() and restored.external_parent_id == "3"
+    offset = dict(tweet, created_at_="Wed Oct 10 20:19:24 -0500 2018", external_parent_id_=None)
+    tweet_created_at(offset)  # As a cursor does when accepting the tweet
+    record, = transform_tweets([(offset, "hello")], get_author_hasher())
+    assert record.utc_created_at == "2018-10-11T01:19:24.000000Z"
+    assert pickle.loads(pickle.dumps(record)).utc_created_at == record.utc_created_at
+    spool.push([record])
+    restored, = spool.pop(1)
+    assert restored.utc_created_at == record.utc_created_at and restored.external_parent_id is None